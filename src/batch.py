@@ -0,0 +1,135 @@
+from typing import Any, Dict, Iterable, Iterator, Optional, TextIO, Tuple
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from flow import BACKENDS
+from loader import load_tournament
+from search import SEARCHES, run_search
+from stats import SolverStats
+import argparse
+import glob
+import json
+import os
+import sys
+
+# command line config
+parser: argparse.ArgumentParser = argparse.ArgumentParser(
+    description='Schedule many tournaments, writing one json line per tournament as soon as it is solved')
+parser.add_argument('paths', type=str, nargs='+', help='tournament files, directories of them or glob patterns')
+parser.add_argument('-o', type=str, help='file to write the json lines to instead of stdout')
+parser.add_argument('--search', choices=SEARCHES, default='lexicographic', help='search run on every tournament')
+parser.add_argument('--backend', choices=list(BACKENDS), default='ssp', help='min cost max flow engine')
+parser.add_argument('--jobs', type=int, default=1, help='number of worker processes, each solving one tournament')
+parser.add_argument('--in-flight', type=int, help='most tournaments submitted and not yet written, 2 * jobs by default')
+
+
+def instance_paths(patterns: Iterable[str]) -> Iterator[Tuple[str, Optional[str]]]:
+    """ Files named by patterns in order, each with None or the error to report instead of solving it
+
+        A directory stands for the .json and packed .bin files in it and a pattern with glob characters for the files
+        it matches, either reports an error if it names no file. Any other pattern is a file and is passed on as it
+        is, so a missing one fails when it is loaded.
+    """
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths = sorted(os.path.join(pattern, name) for name in os.listdir(pattern)
+                           if name.endswith('.json') or name.endswith('.bin'))
+        elif glob.escape(pattern) != pattern:
+            paths = sorted(glob.glob(pattern))
+        else:
+            paths = [pattern]
+        if not paths:
+            yield pattern, 'FileNotFoundError: no tournament file matches {}'.format(pattern)
+        for path in paths:
+            yield path, None
+
+
+def solve_file(path: str, search: str, backend: str) -> Dict[str, Any]:
+    """ Json line of a tournament file: its schedule, bounds and phase timings, or the error that stopped it """
+    stats = SolverStats()
+    try:
+        with stats.timer('parse'):
+            tournament = load_tournament(path)
+        with stats.timer('search'):
+            schedule = run_search(tournament, search, stats=stats, backend=backend)
+        if schedule == None:
+            raise ValueError('no timeslot can hold a match')
+    except Exception as error:
+        return {'path': path, 'ok': False, 'error': '{}: {}'.format(type(error).__name__, error)}
+    return dict({'path': path, 'ok': True}, **schedule.to_dict(), timings=stats.timings)
+
+
+def solve_batch(patterns: Iterable[str], output: TextIO, search: str = 'lexicographic', backend: str = 'ssp',
+                jobs: int = 1, in_flight: Optional[int] = None) -> int:
+    """ Write the json line of every tournament named by patterns to output and return how many failed
+
+        Lines are written in the order tournaments finish. Files are only read by the process solving them and at
+        most in_flight of them are submitted ahead of the writer, so memory does not grow with the batch. A worker
+        that dies fails the lines of the files in flight and the rest of the batch runs on a fresh pool.
+    """
+    failed = 0
+
+    def write(line: Dict[str, Any]) -> None:
+        nonlocal failed
+        failed += not line['ok']
+        output.write(json.dumps(line) + '\n')
+        output.flush()
+
+    if jobs <= 1:
+        for (path, error) in instance_paths(patterns):
+            write(solve_file(path, search, backend) if error == None else {'path': path, 'ok': False, 'error': error})
+        return failed
+
+    limit = max(1, in_flight if in_flight != None else 2 * jobs)
+    executor = ProcessPoolExecutor(max_workers=jobs)
+    pending: 'Dict[Future[Dict[str, Any]], str]' = {}
+
+    def renew() -> None:
+        nonlocal executor
+        executor.shutdown(wait=False)
+        executor = ProcessPoolExecutor(max_workers=jobs)
+
+    def collect(done: 'Iterable[Future[Dict[str, Any]]]') -> bool:
+        """ Write the lines of done futures and return whether the pool broke, replacing it if so """
+        broken = False
+        while done:
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    write(future.result())
+                except BrokenProcessPool as error:
+                    # a worker died, killed for memory say, which takes every file in flight down with it
+                    broken = True
+                    write({'path': path, 'ok': False, 'error': '{}: {}'.format(type(error).__name__, error)})
+            done = wait(pending).done if broken else set()
+        if broken:
+            renew()
+        return broken
+
+    try:
+        for (path, error) in instance_paths(patterns):
+            if error != None:
+                write({'path': path, 'ok': False, 'error': error})
+                continue
+            if len(pending) >= limit:
+                collect(wait(pending, return_when=FIRST_COMPLETED).done)
+            try:
+                future = executor.submit(solve_file, path, search, backend)
+            except BrokenProcessPool:
+                # the pool broke before the writer collected any of its files
+                if not collect(wait(pending).done):
+                    renew()
+                future = executor.submit(solve_file, path, search, backend)
+            pending[future] = path
+        while pending:
+            collect(wait(pending, return_when=FIRST_COMPLETED).done)
+    finally:
+        executor.shutdown()
+    return failed
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    output_stream = sys.stdout if args.o == None else open(args.o, 'w')
+    failures = solve_batch(args.paths, output_stream, search=args.search, backend=args.backend, jobs=args.jobs,
+                           in_flight=args.in_flight)
+    sys.exit(1 if failures else 0)
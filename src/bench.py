@@ -0,0 +1,165 @@
+from typing import Any, Callable, Dict, List, Tuple
+from flow import BACKENDS, FlowNetwork
+from generate import generate_data
+from loader import parse_tournament
+from packed import pack_tournament, parse_packed
+from search import build_instance, component_search, exhaustive_search, lexicographic_search
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+
+# (matches, contestants, hosts, sessions, days) of every benchmark scale
+SCALES: Dict[str, Tuple[int, int, int, int, int]] = {
+    'small': (20, 10, 3, 3, 5),
+    'medium': (100, 30, 5, 3, 10),
+    'large': (400, 80, 10, 4, 14),
+}
+
+# (nodes, arcs, maximum capacity, maximum cost) of random flow networks, unlike schedules they have many cost levels
+FLOW_SCALES: Dict[str, Tuple[int, int, int, int]] = {
+    'flow-small': (200, 2000, 50, 1000),
+    'flow-large': (1000, 10000, 1000, 100000),
+}
+
+
+def best_time(function: Callable[[], Any], repeat: int) -> Tuple[float, Any]:
+    """ Fastest wall time of repeat calls and the result of the last call """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run_scale(name: str, max_parallel: int, density: float, preference: float, seed: int,
+              repeat: int, sweep: bool, divisions: int = 1) -> Dict[str, Any]:
+    matches, contestants, hosts, sessions, days = SCALES[name]
+    data = generate_data(matches, contestants, hosts, sessions, days, max_parallel=max_parallel,
+                         density=density, preference=preference, seed=seed, divisions=divisions)
+    text, packed = json.dumps(data), pack_tournament(data)
+    timings: Dict[str, float] = {}
+    timings['parse'], tournament = best_time(lambda: parse_tournament(json.loads(text)), repeat)
+    timings['build'], instance = best_time(lambda: build_instance(tournament), repeat)
+    timings['parse_packed'], packed_tournament = best_time(lambda: parse_packed(packed), repeat)
+    timings['build_packed'], _ = best_time(lambda: build_instance(packed_tournament), repeat)
+
+    # flow engines alone at the loosest bounds, copying the template is not timed
+    loosest = (max_parallel, days * sessions)
+    for backend in ('ssp', 'simplex'):
+        solve_times: List[float] = []
+        for _ in range(repeat):
+            network = instance.network(*loosest)
+            start = time.perf_counter()
+            BACKENDS[backend](network, instance.source, instance.sink)
+            solve_times.append(time.perf_counter() - start)
+        timings['solve' if backend == 'ssp' else 'solve_' + backend] = min(solve_times)
+
+    timings['lexicographic_search'], schedule = best_time(lambda: lexicographic_search(tournament), repeat)
+    timings['component_search'], _ = best_time(lambda: component_search(tournament), repeat)
+    if sweep:
+        timings['exhaustive_search'], _ = best_time(lambda: exhaustive_search(tournament), repeat)
+    return {
+        'scale': name,
+        'matches': matches, 'contestants': contestants, 'hosts': hosts, 'sessions': sessions, 'days': days,
+        'max_parallel': max_parallel, 'density': density, 'preference': preference, 'seed': seed,
+        'divisions': divisions, 'components': len(instance.components()),
+        'unpruned_nodes': instance.unpruned_nodes,
+        'unpruned_arcs': instance.unpruned_edges,
+        'nodes': instance.template.nodes,
+        'arcs': len(instance.template.head) // 2,
+        'scheduled': len(tournament.matches) - len(schedule.unscheduled_matches),
+        'preferred_count': schedule.preferred_count,
+        'timings': timings,
+    }
+
+
+def run_flow_scale(name: str, seed: int, repeat: int) -> Dict[str, Any]:
+    """ Time every flow backend on a random network from node 0 to the last node """
+    nodes, arcs, capacity, cost = FLOW_SCALES[name]
+    generator = random.Random(seed)
+    edges = [(generator.randrange(nodes), generator.randrange(nodes), generator.randint(1, capacity),
+              generator.randint(0, cost)) for _ in range(arcs)]
+    timings: Dict[str, float] = {}
+    for backend in ('ssp', 'simplex'):
+        solve_times: List[float] = []
+        for _ in range(repeat):
+            network = FlowNetwork(nodes)
+            for edge in edges:
+                network.add_arc(*edge)
+            start = time.perf_counter()
+            BACKENDS[backend](network, 0, nodes - 1)
+            solve_times.append(time.perf_counter() - start)
+        timings['solve' if backend == 'ssp' else 'solve_' + backend] = min(solve_times)
+    return {'scale': name, 'nodes': nodes, 'arcs': arcs, 'capacity': capacity, 'cost': cost, 'seed': seed,
+            'timings': timings}
+
+
+def current_commit() -> str:
+    """ Commit of the checkout this file is in, wherever the benchmark is run from """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(before_path: str, after_path: str) -> None:
+    """ Print the speedup of every timing present in both result files """
+    with open(before_path, 'r') as before_file, open(after_path, 'r') as after_file:
+        before, after = json.load(before_file), json.load(after_file)
+    print('{} -> {}'.format(before['commit'], after['commit']))
+    after_results = {result['scale']: result for result in after['results']}
+    for result in before['results']:
+        if result['scale'] not in after_results:
+            continue
+        for (phase, seconds) in result['timings'].items():
+            if phase in after_results[result['scale']]['timings']:
+                new_seconds = after_results[result['scale']]['timings'][phase]
+                print('{:8} {:22} {:9.4f}s {:9.4f}s {:6.2f}x'.format(
+                    result['scale'], phase, seconds, new_seconds, seconds / new_seconds if new_seconds else float('inf')))
+
+
+if __name__ == '__main__':
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description='Time parsing, network construction, flow solving and bound search on generated tournaments')
+    parser.add_argument('--scales', type=str, default='small,medium,large,flow-small,flow-large',
+                        help='comma separated scales out of {}'.format(', '.join(list(SCALES) + list(FLOW_SCALES))))
+    parser.add_argument('--max-parallel', type=int, default=3, help='maximum number of parallel matches')
+    parser.add_argument('--density', type=float, default=0.4, help='probability of being available in a timeslot')
+    parser.add_argument('--preference', type=float, default=0.5,
+                        help='probability of preferring an available timeslot')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--divisions', type=int, default=1,
+                        help='number of divisions sharing only the hosts, see generate.py')
+    parser.add_argument('--repeat', type=int, default=3, help='report the fastest of this many runs')
+    parser.add_argument('--no-sweep', action='store_true', help='skip the exhaustive sweep')
+    parser.add_argument('-o', type=str, help='file to output results as json')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='compare two result files and exit')
+    args = parser.parse_args()
+
+    if args.compare != None:
+        compare(*args.compare)
+    else:
+        results = []
+        for name in args.scales.split(','):
+            if name in FLOW_SCALES:
+                result = run_flow_scale(name, args.seed, args.repeat)
+                print('{:8} nodes {:6} arcs {:8} '.format(name, result['nodes'], result['arcs']) +
+                      ' '.join('{} {:.4f}s'.format(phase, seconds) for (phase, seconds) in result['timings'].items()))
+                results.append(result)
+                continue
+            result = run_scale(name, args.max_parallel, args.density, args.preference, args.seed,
+                               args.repeat, not args.no_sweep, args.divisions)
+            print('{:8} nodes {:6} -> {:6} arcs {:8} -> {:8} '.format(
+                name, result['unpruned_nodes'], result['nodes'], result['unpruned_arcs'], result['arcs']) +
+                  ' '.join('{} {:.4f}s'.format(phase, seconds) for (phase, seconds) in result['timings'].items()))
+            results.append(result)
+        output = {'commit': current_commit(), 'python': platform.python_version(), 'results': results}
+        if args.o != None:
+            with open(args.o, 'w') as output_file:
+                json.dump(output, output_file, indent=4)
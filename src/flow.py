@@ -1,126 +1,655 @@
-from typing import List, Optional, Tuple, Union
-from queue import Queue
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from array import array
+from collections import Counter, deque
+from itertools import accumulate
+from operator import mul
+from heapq import heappop, heappush
+from stats import SolverStats
 import math
+import time
 
 CostType = Union[int, float]
 
+
 class Edge:
-    """ An edge from u to v in flow network """
-    u: int
-    v: int
-    capacity: int
-    cost: CostType
-    backward_edge: 'Edge' # backward edge for flow algorithm
-
-    def __init__(self, u: int, v: int, capacity: int, cost: CostType, is_forward: bool = True) -> None:
-        self.u = u
-        self.v = v
-        self.capacity = capacity
-        self.cost = cost
-        self.is_forward = is_forward
-        self.flow = 0
-    
-    def get_residual_capacity(self) -> CostType:
-        return self.capacity - self.flow
+    """ Read-only view of arc `index` of a flow network
 
-    def is_valid(self) -> bool:
-        return self.flow >= 0 and self.flow <= self.capacity
+        Arcs are stored in flat arrays by FlowNetwork, views are only created on demand by add_edge and get_edges
+    """
+    __slots__ = ('network', 'index')
+
+    def __init__(self, network: 'FlowNetwork', index: int) -> None:
+        self.network = network
+        self.index = index
+
+    @property
+    def u(self) -> int:
+        return self.network.head[self.index ^ 1]
+
+    @property
+    def v(self) -> int:
+        return self.network.head[self.index]
+
+    @property
+    def capacity(self) -> int:
+        return self.network.capacity[self.index]
+
+    @property
+    def cost(self) -> CostType:
+        return self.network.cost[self.index]
+
+    @property
+    def flow(self) -> int:
+        return self.network.flow[self.index]
 
-    def set_backward_edge(self, backward_edge: 'Edge') -> None:
-        self.backward_edge = backward_edge
+    @property
+    def is_forward(self) -> bool:
+        return self.index & 1 == 0
 
-    def use_edge(self, flow) -> CostType:
-        self.flow += flow
-        self.backward_edge.flow -= flow
-        assert self.is_valid()
-        assert self.backward_edge.is_valid()
-        return flow * self.cost
+    @property
+    def backward_edge(self) -> 'Edge':
+        return Edge(self.network, self.index ^ 1)
+
+    def get_residual_capacity(self) -> int:
+        return self.capacity - self.flow
+
+    def is_valid(self) -> bool:
+        return self.flow <= self.capacity
 
 
 class FlowNetwork:
-    """ Flow Network implemented with adjacent list """
-    nodes: int # number of nodes
-    adjacency_list: List[List['Edge']] # Adjacency list of edges
-    ran: bool # whether min_cost_max_flow function is ran
-    incoming_flow: List[int]
+    """ Flow Network implemented with flat arc arrays and CSR adjacency
+
+        Arc e goes to head[e], its reverse arc is e ^ 1 (forward arcs have even ids) so the tail of e is head[e ^ 1].
+        Reverse arcs have zero capacity and carry the negated flow of their forward arc.
+    """
+    nodes: int  # number of nodes
+    head: array  # head[e] is the node arc e points to
+    capacity: array  # capacity[e] of arc e, 0 for reverse arcs
+    flow: array  # flow[e] on arc e, flow[e ^ 1] == -flow[e]
+    cost: List[CostType]  # cost[e] of arc e, cost[e ^ 1] == -cost[e]
+    offsets: Optional[array]  # arcs leaving u are adjacency[offsets[u]:offsets[u + 1]]
+    adjacency: Optional[array]
+    potential: List[CostType]  # node potentials keeping reduced costs of residual arcs non-negative
+    excess: List[int]  # inflow minus outflow of every node other than source and sink, non-zero after edits of a solved network
+    ran: bool  # whether min_cost_max_flow function is ran, the flow and potentials can then be warm started
+    stats: Optional[SolverStats]  # receives search and augmentation counts and solve time if set
 
     def __init__(self, nodes) -> None:
         self.nodes = nodes
-        self.adjacency_list = [[] for i in range(0, nodes)]
-        self.incoming_flow = [0] * nodes
+        self.head = array('q')
+        self.capacity = array('q')
+        self.flow = array('q')
+        self.cost = []
+        self.offsets = None
+        self.adjacency = None
+        self.potential = [0] * nodes
+        self.excess = [0] * nodes
         self.ran = False
+        self.stats = None
 
-    def add_edge(self, u: int, v: int, capacity: int, cost: CostType) -> 'Edge':
+    def add_edge(self, u: int, v: int, capacity: int, cost: CostType) -> Edge:
+        """ Add an arc from u to v and return a view of it, see add_arc """
+        return Edge(self, self.add_arc(u, v, capacity, cost))
+
+    def add_arc(self, u: int, v: int, capacity: int, cost: CostType) -> int:
+        """ Add an arc from u to v and return its id, the index of the arc in the flat arrays """
         assert u >= 0 and u <= self.nodes
         assert v >= 0 and v <= self.nodes
         assert capacity >= 0
-        forward_edge = Edge(u, v, capacity, cost, is_forward=True)
-        backward_edge = Edge(v, u, capacity, -cost, is_forward=False)
-        backward_edge.flow = capacity
-        forward_edge.set_backward_edge(backward_edge)
-        backward_edge.set_backward_edge(forward_edge)
-        self.adjacency_list[u].append(forward_edge)
-        self.adjacency_list[v].append(backward_edge)
-        return forward_edge
-    
+        edge = len(self.head)
+        self.head.append(v)
+        self.head.append(u)
+        self.capacity.append(capacity)
+        self.capacity.append(0)
+        self.flow.append(0)
+        self.flow.append(0)
+        self.cost.append(cost)
+        self.cost.append(-cost)
+        # adjacency has to be rebuilt
+        self.offsets = None
+        self.adjacency = None
+        if self.ran:
+            self.__restore_slackness(edge)
+        return edge
+
+    def add_node(self) -> int:
+        """ Add a node without arcs and return its id, the node starts balanced with zero potential """
+        self.nodes += 1
+        self.potential.append(0)
+        self.excess.append(0)
+        self.offsets = None
+        self.adjacency = None
+        return self.nodes - 1
+
+    def copy(self) -> 'FlowNetwork':
+        """ Unsolved copy with the same arcs and capacities, costs O(E) array copies """
+        self.__build_adjacency()
+        network = FlowNetwork(self.nodes)
+        network.head = array('q', self.head)
+        network.capacity = array('q', self.capacity)
+        network.flow = array('q', bytes(8 * len(self.flow)))
+        network.cost = list(self.cost)
+        network.offsets = array('q', self.offsets)
+        network.adjacency = array('q', self.adjacency)
+        return network
+
+    def set_capacity(self, edge: int, capacity: int) -> None:
+        """ Change the capacity of arc `edge`, keeping the current flow and potentials
+
+            Flow above the new capacity is cancelled, and a widened arc with a negative reduced cost is saturated.
+            Either way its ends are left with an excess and a deficit that the next min_cost_max_flow routes along
+            shortest paths before augmenting further.
+        """
+        assert edge & 1 == 0
+        assert capacity >= 0
+        self.capacity[edge] = capacity
+        if self.ran:
+            self.__restore_slackness(edge)
+
+    def set_cost(self, edge: int, cost: CostType) -> None:
+        """ Change the cost of arc `edge`, the flow on it is adjusted like in set_capacity """
+        assert edge & 1 == 0
+        self.cost[edge] = cost
+        self.cost[edge ^ 1] = -cost
+        if self.ran:
+            self.__restore_slackness(edge)
+
+    def __restore_slackness(self, edge: int) -> None:
+        """ Set the flow of a changed arc to what the current potentials allow
+
+            Arcs with a negative reduced cost have to be saturated and arcs with a positive one have to be empty,
+            the difference is recorded as an imbalance of the two ends.
+        """
+        u, v = self.head[edge ^ 1], self.head[edge]
+        reduced_cost = self.cost[edge] + self.potential[u] - self.potential[v]
+        if reduced_cost < 0:
+            new_flow = self.capacity[edge]
+        elif reduced_cost > 0:
+            new_flow = 0
+        else:
+            new_flow = min(self.flow[edge], self.capacity[edge])
+        extra = new_flow - self.flow[edge]
+        if extra == 0:
+            return
+        self.flow[edge] += extra
+        self.flow[edge ^ 1] -= extra
+        self.excess[v] += extra
+        self.excess[u] -= extra
+
     def get_edges(self) -> List[Edge]:
-        return [edge for _ in self.adjacency_list for edge in _]
+        self.__build_adjacency()
+        return [Edge(self, edge) for edge in self.adjacency]
+
+    def __build_adjacency(self) -> None:
+        """ Bucket arcs by tail into CSR arrays, arcs of a node keep their insertion order """
+        if self.adjacency is not None:
+            return
+        head = self.head
+        tail = array('q', head)
+        tail[0::2], tail[1::2] = head[1::2], head[0::2]
+        # stable sort by tail, arcs are added after a solve when availability changes so this is kept out of Python loops
+        self.adjacency = array('q', sorted(range(len(head)), key=tail.__getitem__))
+        count = Counter(tail)
+        self.offsets = array('q', accumulate((count[u] for u in range(self.nodes)), initial=0))
 
-    def __shortest_path(self, source: int, sink: int) -> Union[bool, Tuple[int, CostType, List[Edge]]]:
+    def __initial_potential(self) -> None:
+        """ Bellman-Ford (queue based) from a virtual root connected to every node with zero cost arcs
+
+            Only needed when some residual arc has a negative cost, otherwise zero potentials are valid.
+        """
+        head, capacity, flow, cost = self.head, self.capacity, self.flow, self.cost
+        if all(cost[edge] >= 0 for edge in range(len(head)) if flow[edge] < capacity[edge]):
+            return
+        if self.stats is not None:
+            self.stats.count('potential_passes')
+        offsets, adjacency = self.offsets, self.adjacency
+        distance: List[CostType] = [0] * self.nodes
+        in_queue: List[bool] = [True] * self.nodes
+        queue = deque(range(self.nodes))
+        while queue:
+            u = queue.popleft()
+            in_queue[u] = False
+            for i in range(offsets[u], offsets[u + 1]):
+                edge = adjacency[i]
+                v = head[edge]
+                if flow[edge] < capacity[edge] and distance[u] + cost[edge] < distance[v]:
+                    distance[v] = distance[u] + cost[edge]
+                    if not in_queue[v]:
+                        queue.append(v)
+                        in_queue[v] = True
+        self.potential = distance
+
+    def __shortest_path(self, sources: List[int], target: int) -> Tuple[List[CostType], List[int], int]:
         """ Helper function for shortest path in min cost max flow algorithm
-            return False if there is no path between source and sink
-            return max flow, path cost, path if otherwise
+
+            Dijkstra from all sources on reduced costs cost[e] + potential[u] - potential[v], which are non-negative on
+            residual arcs. The search stops once the target or a node with a deficit is settled.
+            return the distance and parent arc of every node and the settled target, -1 if there is none
         """
-        assert source >= 0 and source <= self.nodes
-        assert sink >= 0 and sink <= self.nodes
+        head, capacity, flow, cost = self.head, self.capacity, self.flow, self.cost
+        offsets, adjacency, potential, excess = self.offsets, self.adjacency, self.potential, self.excess
         distance: List[CostType] = [math.inf] * self.nodes
-        parent: List[Optional[Edge]] = [None] * self.nodes
-        in_queue: List[bool] = [False] * self.nodes
-        spfa_queue: Queue[int] = Queue(maxsize=self.nodes)
-
-        spfa_queue.put(source)
-        distance[source] = 0
-        while not spfa_queue.empty():
-            u = spfa_queue.get()
-            in_queue[u] = False
-            for edge in self.adjacency_list[u]:
-                if not in_queue[edge.v] and edge.flow < edge.capacity and distance[u] + edge.cost < distance[edge.v]:
-                    spfa_queue.put(edge.v)
-                    in_queue[edge.v] = True
-                    parent[edge.v] = edge
-                    distance[edge.v] = distance[u] + edge.cost 
-
-        if distance[sink] == math.inf:
-            # no path exists
-            return False
-
-        max_flow: int = parent[sink].get_residual_capacity()
-        current_node: int = sink
-        path_edges: List[Edge] = []
-        while current_node != source:
-            max_flow = min(
-                max_flow, parent[current_node].get_residual_capacity())
-            path_edges.append(parent[current_node])
-            current_node = parent[current_node].u
-        return (max_flow, distance[sink], path_edges)
+        parent: List[int] = [-1] * self.nodes
+        done: List[bool] = [False] * self.nodes
+
+        heap = []
+        for source in sources:
+            distance[source] = 0
+            heap.append((0, source))
+        relaxations: int = 0
+        found: int = -1
+        while heap:
+            d, u = heappop(heap)
+            if done[u]:
+                continue
+            done[u] = True
+            if u == target or excess[u] < 0:
+                found = u
+                break
+            d += potential[u]
+            for i in range(offsets[u], offsets[u + 1]):
+                edge = adjacency[i]
+                v = head[edge]
+                if not done[v] and flow[edge] < capacity[edge]:
+                    nd = d + cost[edge] - potential[v]
+                    if nd < distance[v]:
+                        distance[v] = nd
+                        parent[v] = edge
+                        heappush(heap, (nd, v))
+                        relaxations += 1
+        if self.stats is not None:
+            self.stats.count('searches')
+            self.stats.count('heap_pops', len(sources) + relaxations - len(heap))
+            self.stats.count('relaxations', relaxations)
+        return distance, parent, found
+
+    def __update_potential(self, distance: List[CostType], bound: CostType) -> None:
+        """ Add the distances, capped at the distance of the settled target, so that reduced costs stay non-negative """
+        potential = self.potential
+        for v in range(self.nodes):
+            potential[v] += distance[v] if distance[v] < bound else bound
+
+    def __augment_admissible(self, source: int, sink: int) -> int:
+        """ Push a blocking flow along arcs of zero reduced cost, i.e. along shortest paths only
+
+            Iterative DFS with a current arc pointer per node, nodes on the current path are not entered again
+        """
+        head, capacity, flow, cost = self.head, self.capacity, self.flow, self.cost
+        offsets, adjacency, potential = self.offsets, self.adjacency, self.potential
+        current = offsets[:-1]
+        on_path: List[bool] = [False] * self.nodes
+        total_flow: int = 0
+        paths: int = 0
+        path: List[int] = []
+        u = source
+        on_path[source] = True
+        while True:
+            if u == sink:
+                path_flow = min(capacity[edge] - flow[edge] for edge in path)
+                for edge in path:
+                    flow[edge] += path_flow
+                    flow[edge ^ 1] -= path_flow
+                    on_path[head[edge]] = False
+                total_flow += path_flow
+                paths += 1
+                path.clear()
+                u = source
+                continue
+            i, end = current[u], offsets[u + 1]
+            while i < end:
+                edge = adjacency[i]
+                v = head[edge]
+                if not on_path[v] and flow[edge] < capacity[edge] and cost[edge] + potential[u] - potential[v] == 0:
+                    break
+                i += 1
+            current[u] = i
+            if i < end:
+                path.append(edge)
+                on_path[v] = True
+                u = v
+            elif u == source:
+                break
+            else:
+                # dead end, retreat and skip the arc that led here
+                on_path[u] = False
+                u = head[path.pop() ^ 1]
+                current[u] += 1
+        if self.stats is not None:
+            self.stats.count('augmentations', paths)
+        return total_flow
+
+    def __augment_path(self, source: int, sink: int, parent: List[int], target: int) -> None:
+        """ Push flow along the shortest path tree from a source or a node with an excess to the target
+
+            Paths between source and sink change the flow value, other paths reduce the imbalance of their ends
+        """
+        head, capacity, flow, excess = self.head, self.capacity, self.flow, self.excess
+        path_edges: List[int] = []
+        current_node: int = target
+        while parent[current_node] != -1:
+            edge = parent[current_node]
+            path_edges.append(edge)
+            current_node = head[edge ^ 1]
+        path_flow = min(capacity[edge] - flow[edge] for edge in path_edges)
+        if current_node != source and current_node != sink:
+            path_flow = min(path_flow, excess[current_node])
+        if target != source and target != sink:
+            path_flow = min(path_flow, -excess[target])
+            excess[target] += path_flow
+        if current_node != source and current_node != sink:
+            excess[current_node] -= path_flow
+        for edge in path_edges:
+            flow[edge] += path_flow
+            flow[edge ^ 1] -= path_flow
+        if self.stats is not None:
+            self.stats.count('augmentations')
 
     def min_cost_max_flow(self, source: int, sink: int) -> Tuple[int, CostType]:
+        """ Primal-dual min cost max flow
+
+            Each phase runs Dijkstra on reduced costs, then pushes a blocking flow on the shortest path DAG.
+            Calling it again after set_capacity, set_cost, add_node or add_arc continues from the current flow.
+        """
         assert source >= 0 and source <= self.nodes
         assert sink >= 0 and sink <= self.nodes
-        assert self.ran == False
-        max_flow: int = 0
-        min_cost: CostType = 0
+        if self.stats is not None:
+            start = time.perf_counter()
+        self.__build_adjacency()
+        if not self.ran:
+            self.__initial_potential()
+        excess = self.excess
+        excess[source] = excess[sink] = 0  # source and sink are not balanced
+        unbalanced: List[int] = [v for v in range(self.nodes) if excess[v] != 0]
         while True:
-            for _ in self.adjacency_list:
-                _.sort(key=lambda edge: self.incoming_flow[edge.v], reverse=True)
-            result = self.__shortest_path(source, sink)
-            if result == False:
+            excess_nodes = [v for v in unbalanced if excess[v] > 0]
+            distance, parent, target = self.__shortest_path([source] + excess_nodes, sink)
+            if target == -1 and unbalanced:
+                # the imbalance is cut off from the sink, return excesses to the source and take deficits from the sink
+                if excess_nodes:
+                    distance, parent, target = self.__shortest_path(excess_nodes, source)
+                else:
+                    distance, parent, target = self.__shortest_path([sink], -1)
+                assert target != -1
+            if target == -1:
                 # No path exists
                 break
-            flow, cost, edges = result
-            max_flow += flow
-            for edge in edges:
-                min_cost += edge.use_edge(flow)
-                self.incoming_flow[edge.v] += flow
+            self.__update_potential(distance, distance[target])
+            if unbalanced:
+                self.__augment_path(source, sink, parent, target)
+                unbalanced = [v for v in unbalanced if excess[v] != 0]
+            elif self.__augment_admissible(source, sink) == 0:
+                # zero reduced costs can be missed with float costs, fall back to the tree path
+                self.__augment_path(source, sink, parent, target)
+        assert not unbalanced
+        self.ran = True
+        head, flow, cost = self.head, self.flow, self.cost
+        offsets, adjacency = self.offsets, self.adjacency
+        max_flow: int = -sum(flow[adjacency[i]] for i in range(offsets[sink], offsets[sink + 1]))
+        min_cost: CostType = sum(map(mul, flow[0::2], cost[0::2]))
+        if self.stats is not None:
+            self.stats.count('solves')
+            self.stats.size('nodes', self.nodes)
+            self.stats.size('arcs', len(head) // 2)
+            self.stats.add_time('solve', time.perf_counter() - start)
+        return (max_flow, min_cost)
+
+    def network_simplex(self, source: int, sink: int) -> Tuple[int, CostType]:
+        """ Primal network simplex, same result as min_cost_max_flow without one search per augmentation
+
+            Max flow becomes a min cost circulation through an extra sink -> source arc whose cost is below minus the
+            cost of any path. Every node hangs off an artificial root by a zero cost arc, which the circulation can
+            never use, and pivots pick the most negative reduced cost within blocks of sqrt(E) arcs. The tree is
+            kept with parent, thread and subtree size arrays so pivots only walk the cycle and the moved subtree.
+            Always solves from scratch, the optimal duals become the potentials so min_cost_max_flow can warm start.
+        """
+        assert source >= 0 and source < self.nodes
+        assert sink >= 0 and sink < self.nodes
+        if self.stats is not None:
+            start = time.perf_counter()
+        nodes = self.nodes
+        root = nodes
+        arcs = len(self.head) // 2
+        # arcs 0 .. arcs - 1 are the forward arcs of the network, then the sink -> source arc, then node -> root arcs
+        tail = list(self.head[1::2]) + [sink] + list(range(nodes))
+        head = list(self.head[0::2]) + [source] + [root] * nodes
+        cost = list(self.cost[0::2])
+        capacity = list(self.capacity[0::2])
+        big_cost = 1 + sum(abs(c) for c in cost)
+        # float costs leave round-off in reduced costs, pricing ignores anything that small or pivots never end
+        tolerance = 0 if all(isinstance(c, int) for c in cost) else 1e-9 * big_cost
+        cost += [-big_cost] + [0] * nodes
+        capacity += [sum(capacity[e] for e in range(arcs) if tail[e] == source)] + [0] * nodes
+        flow = [0] * (arcs + 1 + nodes)
+        # 1 at lower bound, -1 at upper bound, 0 in the tree
+        state = [1] * (arcs + 1) + [0] * nodes
+
+        # spanning tree, pred_dir is 1 if the arc to the parent leaves the node and -1 if it enters it
+        parent = [root] * nodes + [-1]
+        pred = list(range(arcs + 1, arcs + 1 + nodes)) + [-1]
+        pred_dir = [1] * nodes + [0]
+        thread = list(range(1, nodes + 1)) + [0]
+        rev_thread = [root] + list(range(nodes))
+        succ_num = [1] * nodes + [nodes + 1]
+        last_succ = list(range(nodes)) + [root - 1]
+        pi = [0] * (nodes + 1)
+
+        search_arcs = arcs + 1
+        block_size = max(10, math.isqrt(search_arcs) + 1)
+        next_arc = 0
+        pivots = 0
+        while True:
+            # block search pivot rule
+            in_arc = -1
+            best = -tolerance
+            count = block_size
+            e = next_arc
+            for _ in range(search_arcs):
+                if state[e] != 0:
+                    c = state[e] * (cost[e] + pi[tail[e]] - pi[head[e]])
+                    if c < best:
+                        best = c
+                        in_arc = e
+                e += 1
+                if e == search_arcs:
+                    e = 0
+                count -= 1
+                if count == 0:
+                    if in_arc != -1:
+                        break
+                    count = block_size
+            if in_arc == -1:
+                break
+            next_arc = e
+            pivots += 1
+
+            # join node of the cycle closed by in_arc
+            u, v = tail[in_arc], head[in_arc]
+            while u != v:
+                if succ_num[u] < succ_num[v]:
+                    u = parent[u]
+                else:
+                    v = parent[v]
+            join = u
+
+            # leaving arc, the first bottleneck when walking the cycle in the direction of the flow
+            if state[in_arc] == 1:
+                first, second = tail[in_arc], head[in_arc]
+            else:
+                first, second = head[in_arc], tail[in_arc]
+            delta = capacity[in_arc]
+            result = 0
+            u_out = -1
+            u = first
+            while u != join:
+                e = pred[u]
+                d = flow[e] if pred_dir[u] == 1 else capacity[e] - flow[e]
+                if d < delta:
+                    delta = d
+                    u_out = u
+                    result = 1
+                u = parent[u]
+            u = second
+            while u != join:
+                e = pred[u]
+                d = capacity[e] - flow[e] if pred_dir[u] == 1 else flow[e]
+                if d <= delta:
+                    delta = d
+                    u_out = u
+                    result = 2
+                u = parent[u]
+            if result == 1:
+                u_in, v_in = first, second
+            else:
+                u_in, v_in = second, first
+
+            # push delta around the cycle
+            if delta > 0:
+                value = state[in_arc] * delta
+                flow[in_arc] += value
+                u = tail[in_arc]
+                while u != join:
+                    flow[pred[u]] -= pred_dir[u] * value
+                    u = parent[u]
+                u = head[in_arc]
+                while u != join:
+                    flow[pred[u]] += pred_dir[u] * value
+                    u = parent[u]
+            if result == 0:
+                # in_arc is its own bottleneck and moves to the other bound
+                state[in_arc] = -state[in_arc]
+                continue
+            state[in_arc] = 0
+            state[pred[u_out]] = 1 if flow[pred[u_out]] == 0 else -1
+
+            # move the subtree of u_out below v_in, reversing the stem from u_in up to u_out
+            old_rev_thread = rev_thread[u_out]
+            old_succ_num = succ_num[u_out]
+            old_last_succ = last_succ[u_out]
+            v_out = parent[u_out]
+            if u_in == u_out:
+                parent[u_in] = v_in
+                pred[u_in] = in_arc
+                pred_dir[u_in] = 1 if u_in == tail[in_arc] else -1
+                if thread[v_in] != u_out:
+                    after = thread[old_last_succ]
+                    thread[old_rev_thread] = after
+                    rev_thread[after] = old_rev_thread
+                    after = thread[v_in]
+                    thread[v_in] = u_out
+                    rev_thread[u_out] = v_in
+                    thread[old_last_succ] = after
+                    rev_thread[after] = old_last_succ
+            else:
+                thread_continue = thread[old_last_succ] if old_rev_thread == v_in else thread[v_in]
+                stem = u_in
+                par_stem = v_in
+                last = last_succ[u_in]
+                after = thread[last]
+                thread[v_in] = u_in
+                dirty_revs = [v_in]
+                while stem != u_out:
+                    next_stem = parent[stem]
+                    thread[last] = next_stem
+                    dirty_revs.append(last)
+                    before = rev_thread[stem]
+                    thread[before] = after
+                    rev_thread[after] = before
+                    parent[stem] = par_stem
+                    par_stem = stem
+                    stem = next_stem
+                    last = rev_thread[par_stem] if last_succ[stem] == last_succ[par_stem] else last_succ[stem]
+                    after = thread[last]
+                parent[u_out] = par_stem
+                thread[last] = thread_continue
+                rev_thread[thread_continue] = last
+                last_succ[u_out] = last
+                if old_rev_thread != v_in:
+                    thread[old_rev_thread] = after
+                    rev_thread[after] = old_rev_thread
+                for u in dirty_revs:
+                    rev_thread[thread[u]] = u
+                tmp_sc, tmp_ls = 0, last_succ[u_out]
+                u = u_out
+                while u != u_in:
+                    p = parent[u]
+                    pred[u] = pred[p]
+                    pred_dir[u] = -pred_dir[p]
+                    tmp_sc += succ_num[u] - succ_num[p]
+                    succ_num[u] = tmp_sc
+                    last_succ[p] = tmp_ls
+                    u = p
+                pred[u_in] = in_arc
+                pred_dir[u_in] = 1 if u_in == tail[in_arc] else -1
+                succ_num[u_in] = old_succ_num
+
+            up_limit_out = join if last_succ[join] == v_in else -1
+            last_succ_out = last_succ[u_out]
+            u = v_in
+            while u != -1 and last_succ[u] == v_in:
+                last_succ[u] = last_succ_out
+                u = parent[u]
+            if join != old_rev_thread and v_in != old_rev_thread:
+                u = v_out
+                while u != up_limit_out and last_succ[u] == old_last_succ:
+                    last_succ[u] = old_rev_thread
+                    u = parent[u]
+            elif last_succ_out != old_last_succ:
+                u = v_out
+                while u != up_limit_out and last_succ[u] == old_last_succ:
+                    last_succ[u] = last_succ_out
+                    u = parent[u]
+            u = v_in
+            while u != join:
+                succ_num[u] += old_succ_num
+                u = parent[u]
+            u = v_out
+            while u != join:
+                succ_num[u] -= old_succ_num
+                u = parent[u]
+
+            # keep reduced costs of tree arcs at zero by shifting the potentials of the moved subtree
+            sigma = pi[v_in] - pi[u_in] - pred_dir[u_in] * cost[in_arc]
+            end = thread[last_succ[u_in]]
+            u = u_in
+            while u != end:
+                pi[u] += sigma
+                u = thread[u]
+
+        for e in range(arcs):
+            self.flow[2 * e] = flow[e]
+            self.flow[2 * e + 1] = -flow[e]
+        self.potential = pi[:nodes]
+        self.excess = [0] * nodes
         self.ran = True
+        self.__build_adjacency()
+        max_flow: int = flow[arcs]
+        min_cost: CostType = sum(map(mul, flow[:arcs], cost[:arcs]))
+        if self.stats is not None:
+            self.stats.count('solves')
+            self.stats.count('pivots', pivots)
+            self.stats.size('nodes', self.nodes)
+            self.stats.size('arcs', arcs)
+            self.stats.add_time('solve', time.perf_counter() - start)
         return (max_flow, min_cost)
+
+    def cross_check(self, source: int, sink: int) -> Tuple[int, CostType]:
+        """ min_cost_max_flow that also solves a copy with network_simplex and raises RuntimeError unless both agree
+
+            Float costs only have to agree up to round-off, the two engines sum them in different orders.
+        """
+        check = self.copy()
+        expected = check.network_simplex(source, sink)
+        result = self.min_cost_max_flow(source, sink)
+        if result[0] != expected[0] or not (result[1] == expected[1] or (
+                isinstance(result[1], float) and math.isclose(result[1], expected[1], rel_tol=1e-9, abs_tol=1e-9))):
+            raise RuntimeError('min_cost_max_flow gives {} but network_simplex gives {}'.format(result, expected))
+        return result
+
+
+# min cost max flow engines by name, each sets the flow of every arc of the network and returns (flow, cost)
+BACKENDS: Dict[str, Callable[[FlowNetwork, int, int], Tuple[int, CostType]]] = {
+    'ssp': FlowNetwork.min_cost_max_flow,
+    'simplex': FlowNetwork.network_simplex,
+    'check': FlowNetwork.cross_check,
+}
@@ -0,0 +1,93 @@
+from typing import Any, Dict, List
+import argparse
+import json
+import random
+
+
+def generate_data(matches: int,
+                  contestants: int,
+                  hosts: int,
+                  sessions: int,
+                  days: int,
+                  max_parallel: int = 3,
+                  density: float = 0.5,
+                  preference: float = 0.5,
+                  seed: int = 0,
+                  divisions: int = 1) -> Dict[str, Any]:
+    """ Random tournament in the json input format
+
+        Every person is available in each timeslot with probability density and prefers each of its available
+        timeslots with probability preference. Matches are distinct pairs of contestants.
+        With divisions > 1 contestants, days and matches are split into that many divisions, contestants only play
+        and are only available within their own division while hosts serve every division.
+    """
+    generator = random.Random(seed)
+    day_names: List[str] = ['day{}'.format(i + 1) for i in range(days)]
+    session_names: List[str] = ['session{}'.format(i + 1) for i in range(sessions)]
+    contestant_names: List[str] = ['contestant{}'.format(i + 1) for i in range(contestants)]
+    host_names: List[str] = ['host{}'.format(i + 1) for i in range(hosts)]
+    timeslots = [{'day': day, 'session': session} for day in day_names for session in session_names]
+    # contestants, timeslots and number of matches of every division
+    division_contestants = [contestant_names[len(contestant_names) * i // divisions:len(contestant_names) * (i + 1) // divisions]
+                            for i in range(divisions)]
+    division_timeslots = [timeslots[len(session_names) * (days * i // divisions):len(session_names) * (days * (i + 1) // divisions)]
+                          for i in range(divisions)]
+    division_matches = [matches * (i + 1) // divisions - matches * i // divisions for i in range(divisions)]
+    division_pairs = [[(a, b) for (i, a) in enumerate(names) for b in names[i + 1:]] for names in division_contestants]
+    for (names, pairs, count) in zip(division_contestants, division_pairs, division_matches):
+        if count > len(pairs):
+            raise ValueError('{} contestants can play at most {} distinct matches'.format(len(names), len(pairs)))
+
+    def availability(people: List[str], timeslots: List[Dict[str, str]]):
+        available = {person: [timeslot for timeslot in timeslots if generator.random() < density] for person in people}
+        preferred = {person: [timeslot for timeslot in available[person] if generator.random() < preference]
+                     for person in people}
+        return available, preferred
+
+    hosts_availability, hosts_preference = availability(host_names, timeslots)
+    contestants_availability, contestants_preference = {}, {}
+    for (names, slots) in zip(division_contestants, division_timeslots):
+        available, preferred = availability(names, slots)
+        contestants_availability.update(available)
+        contestants_preference.update(preferred)
+    return {
+        'max_parallel': max_parallel,
+        'days': day_names,
+        'contestants': contestant_names,
+        'hosts': host_names,
+        'sessions': session_names,
+        'matches': [{'contestant1': a, 'contestant2': b}
+                    for (pairs, count) in zip(division_pairs, division_matches) for (a, b) in generator.sample(pairs, count)],
+        'hosts_availability': hosts_availability,
+        'hosts_preference': hosts_preference,
+        'contestants_availability': contestants_availability,
+        'contestants_preference': contestants_preference,
+    }
+
+
+if __name__ == '__main__':
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description='Generate a random tournament in the json input format')
+    parser.add_argument('-n', '--matches', type=int, required=True, help='number of matches')
+    parser.add_argument('-c', '--contestants', type=int, required=True, help='number of contestants')
+    parser.add_argument('--hosts', type=int, required=True, help='number of hosts')
+    parser.add_argument('-k', '--sessions', type=int, required=True, help='number of sessions per day')
+    parser.add_argument('-m', '--days', type=int, required=True, help='number of days')
+    parser.add_argument('--max-parallel', type=int, default=3, help='maximum number of parallel matches')
+    parser.add_argument('--density', type=float, default=0.5, help='probability of being available in a timeslot')
+    parser.add_argument('--preference', type=float, default=0.5,
+                        help='probability of preferring an available timeslot')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--divisions', type=int, default=1,
+                        help='number of divisions sharing only the hosts, each with its own contestants and days')
+    parser.add_argument('-o', type=str, help='file to output tournament')
+    args = parser.parse_args()
+
+    data = generate_data(args.matches, args.contestants, args.hosts, args.sessions, args.days,
+                         max_parallel=args.max_parallel, density=args.density, preference=args.preference, seed=args.seed,
+                         divisions=args.divisions)
+    if args.o != None:
+        with open(args.o, 'w') as output_file:
+            json.dump(data, output_file, indent=4)
+    else:
+        print(json.dumps(data, indent=4))
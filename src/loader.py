@@ -0,0 +1,71 @@
+from typing import Any, Dict, List
+from model import Availability, Contestant, Day, Host, Match, Session, Timeslot, Tournament, TournamentDiff
+from packed import is_packed, load_packed
+import json
+
+
+def parse_tournament(data: Dict[str, Any]) -> Tournament:
+    """ Build a Tournament from the decoded json input format """
+    max_parallel: int = data['max_parallel']
+    days: List[Day] = data['days']
+    sessions: List[Session] = data['sessions']
+    contestants: List[Contestant] = data['contestants']
+    hosts: List[Host] = data['hosts']
+    matches: List[Match] = [(match['contestant1'], match['contestant2'])
+                            for match in data['matches']]
+    hosts_availability: Dict[Host, Availability] = {
+        host: {Timeslot(timeslot['day'], timeslot['session']) for timeslot in _} for (host, _) in data['hosts_availability'].items()}
+    hosts_preference: Dict[Host, Availability] = {
+        host: {Timeslot(timeslot['day'], timeslot['session']) for timeslot in _} for (host, _) in data['hosts_preference'].items()}
+    contestants_availability: Dict[Contestant, Availability] = {
+        contestant: {Timeslot(timeslot['day'], timeslot['session']) for timeslot in _} for (contestant, _) in data['contestants_availability'].items()}
+    contestants_preference: Dict[Contestant, Availability] = {
+        contestant: {Timeslot(timeslot['day'], timeslot['session']) for timeslot in _} for (contestant, _) in data['contestants_preference'].items()}
+    return Tournament(max_parallel, days, sessions, contestants, hosts, matches,
+                      hosts_availability, hosts_preference, contestants_availability, contestants_preference)
+
+
+def parse_availability(data: Dict[str, List[Dict[str, str]]]) -> Dict[str, Availability]:
+    return {name: {Timeslot(timeslot['day'], timeslot['session']) for timeslot in _} for (name, _) in data.items()}
+
+
+def parse_diff(data: Any) -> TournamentDiff:
+    """ Build a TournamentDiff from json in the style of the input format, every key is optional
+
+        added_availability, removed_availability, added_preference and removed_preference map a host or contestant
+        to a list of timeslots, added_matches and withdrawn_matches are lists of matches.
+    """
+    if not isinstance(data, dict):
+        raise TypeError('diff must be a json object, not {}'.format(type(data).__name__))
+    for (key, value) in data.items():
+        if key in ('added_availability', 'removed_availability', 'added_preference', 'removed_preference'):
+            if not isinstance(value, dict) or not all(isinstance(timeslots, list) for timeslots in value.values()):
+                raise TypeError('{} must map names to lists of timeslots'.format(key))
+        elif key in ('added_matches', 'withdrawn_matches'):
+            if not isinstance(value, list) or not all(isinstance(match, dict) for match in value):
+                raise TypeError('{} must be a list of matches'.format(key))
+        else:
+            raise ValueError('unknown diff key {}'.format(key))
+    return TournamentDiff(added_availability=parse_availability(data.get('added_availability', {})),
+                          removed_availability=parse_availability(data.get('removed_availability', {})),
+                          added_preference=parse_availability(data.get('added_preference', {})),
+                          removed_preference=parse_availability(data.get('removed_preference', {})),
+                          added_matches=[(match['contestant1'], match['contestant2'])
+                                         for match in data.get('added_matches', [])],
+                          withdrawn_matches=[(match['contestant1'], match['contestant2'])
+                                             for match in data.get('withdrawn_matches', [])])
+
+
+def parse_names(data: Any, what: str) -> List[str]:
+    """ List of names given as json, e.g. the hosts added by a what-if """
+    if not isinstance(data, list) or not all(isinstance(name, str) for name in data):
+        raise TypeError('{} must be a list of names'.format(what))
+    return data
+
+
+def load_tournament(path: str) -> Tournament:
+    """ Tournament of a packed file, see packed.py, or of a json file otherwise """
+    if is_packed(path):
+        return load_packed(path)
+    with open(path, 'r') as data_file:
+        return parse_tournament(json.load(data_file))
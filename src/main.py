@@ -1,61 +1,85 @@
-from typing import Dict, List, Optional
+from typing import Optional, TextIO
+from contextlib import nullcontext
 from schedule import Schedule
-from model import Day, Session, Contestant, Host, Match, Availability, Timeslot
+from flow import BACKENDS
+from loader import load_tournament
+from search import SEARCHES, anytime_search, run_search
+from stats import SolverStats
 import argparse
 import json
 import sys
+import time
 
 # command line config
 parser: argparse.ArgumentParser = argparse.ArgumentParser(
     description='Generate match schedule given availability of contestant')
 parser.add_argument('data_path', type=str, help='file to availability data')
 parser.add_argument('-o', type=str, help='file to output schedule')
+parser.add_argument('--search', choices=SEARCHES, default='lexicographic',
+                    help='binary search the bounds (default), binary search them on every independent part of the '
+                         'tournament, or try every pair of bounds as a reference')
+parser.add_argument('--jobs', type=int, default=1,
+                    help='number of worker processes for the components and exhaustive searches')
+parser.add_argument('--backend', choices=list(BACKENDS), default='ssp',
+                    help='min cost max flow engine: successive shortest paths (default), network simplex, or both '
+                         'with a check that they agree')
+parser.add_argument('--time-limit', type=float,
+                    help='stop the lexicographic search after this many seconds with the best schedule found so far, '
+                         'every improvement is reported on stderr')
+parser.add_argument('--stats', type=str, nargs='?', const='-',
+                    help='write solver counters and timings as json to a file, or stderr if no file is given')
 
-# parse arguments
-args = parser.parse_args()
-
-# read data and parse data
-data_file = open(args.data_path, 'r')
-data = json.load(data_file)
-
-max_parallel: int = data['max_parallel']
-days: List[Day] = data['days']
-sessions: List[Session] = data['sessions']
-contestants: List[Contestant] = data['contestants']
-hosts: List[Host] = data['hosts']
-matches: List[Match] = [(match['contestant1'], match['contestant2'])
-                        for match in data['matches']]
-hosts_availability: Dict[Host, Availability] = {
-    host: {Timeslot(timeslot['day'], timeslot['session']) for timeslot in _} for (host, _) in data['hosts_availability'].items()}
-hosts_preference: Dict[Host, Availability] = {
-    host: {Timeslot(timeslot['day'], timeslot['session']) for timeslot in _} for (host, _) in data['hosts_preference'].items()}
-contestants_availability: Dict[Contestant, Availability] = {
-    contestant: {Timeslot(timeslot['day'], timeslot['session']) for timeslot in _} for (contestant, _) in data['contestants_availability'].items()}
-contestants_preference: Dict[Contestant, Availability] = {
-    contestant: {Timeslot(timeslot['day'], timeslot['session']) for timeslot in _} for (contestant, _) in data['contestants_preference'].items()}
-
-# main
-best_schedule: Optional[Schedule] = None
-for parallel in range(1, max_parallel+1):
-    for max_per_day in range(1, len(days) * len(sessions) + 1):
-        schedule = Schedule.generate_schedule(parallel, max_per_day, days, contestants, hosts, sessions,
-                                              matches, hosts_availability, hosts_preference, contestants_availability, contestants_preference)
-        if best_schedule == None or schedule.better_than(best_schedule):
-            best_schedule = schedule
-
-output_stream = sys.stdout
-if args.o != None:
-    output_stream = open(args.o, 'w')
-
-for (match, config) in best_schedule.schedule:
-    print('----- {} vs {} -----'.format(match[0], match[1]), file=output_stream)
-    print('Host: {}'.format(config.host), file=output_stream)
-    print('Date: {}'.format(config.timeslot.day), file=output_stream)
-    print('Session: {}'.format(config.timeslot.session), file=output_stream)
-    print('', file=output_stream)
-
-print('-----------------', file=output_stream)
-print('Preferred count: {}'.format(schedule.preferred_count), file=output_stream)
-print('Max parallel: {}'.format(schedule.max_parallel), file=output_stream)
-print('Unscheduled Matches: {}'.format(schedule.unscheduled_matches), file=output_stream)
 
+def print_schedule(schedule: Schedule, output_stream: TextIO, proven: Optional[bool] = None) -> None:
+    for (match, config) in schedule.schedule:
+        print('----- {} vs {} -----'.format(match[0], match[1]), file=output_stream)
+        print('Host: {}'.format(config.host), file=output_stream)
+        print('Date: {}'.format(config.timeslot.day), file=output_stream)
+        print('Session: {}'.format(config.timeslot.session), file=output_stream)
+        print('', file=output_stream)
+
+    print('-----------------', file=output_stream)
+    print('Preferred count: {}'.format(schedule.preferred_count), file=output_stream)
+    print('Max parallel: {}'.format(schedule.max_parallel), file=output_stream)
+    print('Unscheduled Matches: {}'.format(schedule.unscheduled_matches), file=output_stream)
+    if proven != None:
+        print('Proven optimal: {}'.format('yes' if proven else 'no, time limit reached'), file=output_stream)
+
+
+if __name__ == '__main__':
+    # parse arguments
+    args = parser.parse_args()
+    stats: Optional[SolverStats] = SolverStats() if args.stats != None else None
+
+    # read data and parse data
+    with (stats.timer('parse') if stats != None else nullcontext()):
+        tournament = load_tournament(args.data_path)
+
+    # main
+    best_schedule: Optional[Schedule] = None
+    proven: Optional[bool] = None
+    with (stats.timer('search') if stats != None else nullcontext()):
+        if args.time_limit != None:
+            if args.search != 'lexicographic':
+                parser.error('--time-limit needs --search lexicographic')
+            start = time.perf_counter()
+            for (best_schedule, proven) in anytime_search(tournament, stats, args.backend, args.time_limit):
+                print('{:.3f}s: {} unscheduled, preferred count {}, max parallel {}, max per day {}{}'.format(
+                    time.perf_counter() - start, len(best_schedule.unscheduled_matches), best_schedule.preferred_count,
+                    best_schedule.max_parallel, best_schedule.max_per_day, ', proven optimal' if proven else ''),
+                    file=sys.stderr)
+        else:
+            best_schedule = run_search(tournament, args.search, jobs=args.jobs, stats=stats, backend=args.backend)
+
+    output_stream = sys.stdout
+    if args.o != None:
+        output_stream = open(args.o, 'w')
+    print_schedule(best_schedule, output_stream, proven)
+
+    if stats != None:
+        if args.stats == '-':
+            json.dump(stats.to_dict(), sys.stderr, indent=4)
+            print(file=sys.stderr)
+        else:
+            with open(args.stats, 'w') as stats_file:
+                json.dump(stats.to_dict(), stats_file, indent=4)
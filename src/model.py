@@ -1,5 +1,5 @@
-from dataclasses import dataclass
-from typing import NewType, List, Tuple, Set
+from dataclasses import dataclass, field, replace
+from typing import Dict, Iterable, Iterator, Mapping, NewType, List, Optional, Tuple, Set
 
 Day = NewType('Day', str)
 Session = NewType('Session', str)
@@ -32,3 +32,117 @@ class MatchConfig:
         return self.host == other.host and self.timeslot == other.timeslot
     
 Availability = NewType('Availability', Set[Timeslot])
+
+
+@dataclass
+class AvailabilityMasks:
+    """ Availability and preference of every host and contestant as bitmasks, by position in the tournament lists
+
+        Bit len(sessions) * d + s stands for the timeslot (days[d], sessions[s]), the numbering ScheduleInstance uses.
+    """
+    hosts_availability: List[int]
+    hosts_preference: List[int]
+    contestants_availability: List[int]
+    contestants_preference: List[int]
+
+
+class MaskAvailability(Mapping):
+    """ Read only dict of availability sets kept as bitmasks, a set of Timeslot is only made when a name is looked up """
+    names: Dict[str, int]
+    masks: List[int]
+    days: List[Day]
+    sessions: List[Session]
+
+    def __init__(self, names: List[str], masks: List[int], days: List[Day], sessions: List[Session]) -> None:
+        self.names = {name: i for (i, name) in enumerate(names)}
+        self.masks = masks
+        self.days = days
+        self.sessions = sessions
+
+    def __getitem__(self, name: str) -> Availability:
+        mask = self.masks[self.names[name]]
+        timeslots = set()
+        while mask:
+            lowest = mask & -mask
+            mask ^= lowest
+            (day, session) = divmod(lowest.bit_length() - 1, len(self.sessions))
+            timeslots.add(Timeslot(self.days[day], self.sessions[session]))
+        return timeslots
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+@dataclass
+class Tournament:
+    """ Parsed scheduling problem, everything generate_schedule needs apart from the two bounds """
+    max_parallel: int
+    days: List[Day]
+    sessions: List[Session]
+    contestants: List[Contestant]
+    hosts: List[Host]
+    matches: List[Match]
+    hosts_availability: Dict[Host, Availability]
+    hosts_preference: Dict[Host, Availability]
+    contestants_availability: Dict[Contestant, Availability]
+    contestants_preference: Dict[Contestant, Availability]
+    # the same availability as bitmasks if it was loaded that way, the dicts are then MaskAvailability views of it
+    masks: Optional[AvailabilityMasks] = None
+
+
+@dataclass
+class TournamentDiff:
+    """ Edit of a tournament, the timeslot sets are keyed by host or contestant
+
+        Removing an available timeslot also removes it from the preference, adding a preferred timeslot also makes
+        it available. A name that is both a host and a contestant is edited in both roles.
+    """
+    added_availability: Dict[str, Availability] = field(default_factory=dict)
+    removed_availability: Dict[str, Availability] = field(default_factory=dict)
+    added_preference: Dict[str, Availability] = field(default_factory=dict)
+    removed_preference: Dict[str, Availability] = field(default_factory=dict)
+    added_matches: List[Match] = field(default_factory=list)
+    withdrawn_matches: List[Match] = field(default_factory=list)
+
+
+def apply_diff(tournament: Tournament, diff: TournamentDiff, added_hosts: Iterable[Host] = ()) -> Tournament:
+    """ Edited copy of tournament, the same edit as ScheduleInstance.update makes to its bitmasks
+
+        added_hosts join with the availability and preference the diff gives them, which update cannot do since
+        configs are numbered by host. Every other name in the diff must already be a host or contestant.
+    """
+    hosts = list(tournament.hosts) + [host for host in added_hosts if host not in tournament.hosts]
+    people = set(hosts) | set(tournament.contestants)
+    for person in set(diff.added_availability) | set(diff.removed_availability) | set(diff.added_preference) | set(diff.removed_preference):
+        if person not in people:
+            raise ValueError('unknown host or contestant {}'.format(person))
+    for match in diff.added_matches:
+        for contestant in match:
+            if contestant not in tournament.contestants:
+                raise ValueError('unknown contestant {}'.format(contestant))
+
+    def edit(availability: Dict[str, Availability], preference: Dict[str, Availability],
+             names: List[str]) -> Tuple[Dict[str, Availability], Dict[str, Availability]]:
+        edited_availability, edited_preference = {}, {}
+        for name in names:
+            available = availability.get(name, set()) | preference.get(name, set())
+            available |= diff.added_availability.get(name, set()) | diff.added_preference.get(name, set())
+            available -= diff.removed_availability.get(name, set())
+            preferred = (preference.get(name, set()) | diff.added_preference.get(name, set())) & available
+            edited_availability[name] = available
+            edited_preference[name] = preferred - diff.removed_preference.get(name, set())
+        return edited_availability, edited_preference
+
+    hosts_availability, hosts_preference = edit(tournament.hosts_availability, tournament.hosts_preference, hosts)
+    contestants_availability, contestants_preference = edit(
+        tournament.contestants_availability, tournament.contestants_preference, tournament.contestants)
+    matches = [match for match in tournament.matches if match not in diff.withdrawn_matches]
+    for match in diff.added_matches:
+        if match not in matches:
+            matches.append(match)
+    return replace(tournament, hosts=hosts, matches=matches, hosts_availability=hosts_availability,
+                   hosts_preference=hosts_preference, contestants_availability=contestants_availability,
+                   contestants_preference=contestants_preference, masks=None)
@@ -0,0 +1,149 @@
+from typing import Any, Dict, List
+from model import AvailabilityMasks, MaskAvailability, Tournament
+import argparse
+import json
+import mmap
+import os
+import struct
+
+# command line config
+parser: argparse.ArgumentParser = argparse.ArgumentParser(
+    description='Convert a tournament from the json input format to the packed binary format')
+parser.add_argument('data_path', type=str, help='file to availability data')
+parser.add_argument('-o', type=str, help='file to write, the data path with a .bin extension by default')
+
+# Layout, every integer is little endian:
+#   header: magic, version, padding, then max_parallel and the number of names, bytes of name text, days, sessions,
+#           contestants, hosts and matches as u32
+#   names: u32 offset of every name into the name text and its end, then the utf-8 name text padded to 4 bytes
+#   u32 name index of every day, session, contestant and host, then the two contestant indices of every match
+#   bitmasks of ceil(days * sessions / 8) bytes: host availability, host preference, contestant availability and
+#   contestant preference of every person in list order, bit len(sessions) * d + s is timeslot (days[d], sessions[s])
+MAGIC: bytes = b'LKSP'
+VERSION: int = 1
+HEADER: struct.Struct = struct.Struct('<4sHH8I')
+
+
+def is_packed(path: str) -> bool:
+    """ Whether path is read as a packed file: it starts with the magic or has a .bin extension
+
+        A .bin file too short or damaged to hold the magic is still packed, so it fails as a truncated packed file
+        rather than as malformed json.
+    """
+    if path.endswith('.bin'):
+        return True
+    with open(path, 'rb') as data_file:
+        return data_file.read(len(MAGIC)) == MAGIC
+
+
+def pack_tournament(data: Dict[str, Any]) -> bytes:
+    """ Packed form of the decoded json input format, timeslots off the days x sessions grid are dropped
+
+        Every name is stored once however often it appears, a host that is also a contestant included
+    """
+    names: Dict[str, int] = {}
+
+    def intern(name: str) -> int:
+        return names.setdefault(name, len(names))
+
+    days, sessions = data['days'], data['sessions']
+    indices: List[int] = [intern(name) for key in ('days', 'sessions', 'contestants', 'hosts') for name in data[key]]
+    contestant_index = {contestant: i for (i, contestant) in enumerate(data['contestants'])}
+    for match in data['matches']:
+        indices += (contestant_index[match['contestant1']], contestant_index[match['contestant2']])
+
+    slot_index = {(day, session): len(sessions) * i + j for (i, day) in enumerate(days) for (j, session) in enumerate(sessions)}
+    mask_bytes = (len(slot_index) + 7) // 8
+    masks = bytearray()
+    for (people, key) in (('hosts', 'hosts_availability'), ('hosts', 'hosts_preference'),
+                          ('contestants', 'contestants_availability'), ('contestants', 'contestants_preference')):
+        for person in data[people]:
+            mask = 0
+            for timeslot in data[key].get(person, ()):
+                slot = slot_index.get((timeslot['day'], timeslot['session']))
+                if slot != None:
+                    mask |= 1 << slot
+            masks += mask.to_bytes(mask_bytes, 'little')
+
+    text = bytearray()
+    offsets: List[int] = [0]
+    for name in names:
+        text += name.encode()
+        offsets.append(len(text))
+    text += bytes(-len(text) % 4)
+    header = HEADER.pack(MAGIC, VERSION, 0, data['max_parallel'], len(names), offsets[-1], len(days), len(sessions),
+                         len(data['contestants']), len(data['hosts']), len(data['matches']))
+    return b''.join((header, struct.pack('<{}I'.format(len(offsets)), *offsets), text,
+                     struct.pack('<{}I'.format(len(indices)), *indices), masks))
+
+
+def parse_packed(buffer: Any) -> Tournament:
+    """ Tournament of a packed buffer, availability stays in bitmasks fed to ScheduleInstance as they are
+
+        The availability dicts of the tournament are MaskAvailability views, a set of Timeslot is only made for a
+        person whose dict entry is looked up, which the scheduler never does.
+    """
+    with memoryview(buffer) as view:
+        if len(view) < HEADER.size:
+            raise ValueError('truncated packed tournament')
+        (magic, version, _, max_parallel, name_count, text_size, day_count, session_count, contestant_count,
+         host_count, match_count) = HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('not a packed tournament of version {}'.format(VERSION))
+        counts = (day_count, session_count, contestant_count, host_count)
+        mask_bytes = (day_count * session_count + 7) // 8
+        size = (HEADER.size + 4 * (name_count + 1) + text_size + -text_size % 4 + 4 * (sum(counts) + 2 * match_count)
+                + 2 * mask_bytes * (host_count + contestant_count))
+        if len(view) < size:
+            raise ValueError('truncated packed tournament')
+        offset = HEADER.size
+        offsets = struct.unpack_from('<{}I'.format(name_count + 1), view, offset)
+        offset += 4 * (name_count + 1)
+        text = bytes(view[offset:offset + text_size])
+        offset += text_size + -text_size % 4
+        if any(start > end for (start, end) in zip(offsets, offsets[1:])) or offsets[-1] != text_size:
+            raise ValueError('corrupt packed tournament: name offsets out of order')
+        names = [text[start:end].decode() for (start, end) in zip(offsets, offsets[1:])]
+
+        indices = struct.unpack_from('<{}I'.format(sum(counts) + 2 * match_count), view, offset)
+        offset += 4 * len(indices)
+        lists: List[List[str]] = []
+        start = 0
+        for count in counts:
+            if any(index >= name_count for index in indices[start:start + count]):
+                raise ValueError('corrupt packed tournament: unknown name index')
+            lists.append([names[index] for index in indices[start:start + count]])
+            start += count
+        days, sessions, contestants, hosts = lists
+        if any(index >= contestant_count for index in indices[start:]):
+            raise ValueError('corrupt packed tournament: match of an unknown contestant')
+        matches = [(contestants[indices[i]], contestants[indices[i + 1]]) for i in range(start, len(indices), 2)]
+
+        sections: List[List[int]] = []
+        for count in (host_count, host_count, contestant_count, contestant_count):
+            sections.append([int.from_bytes(view[offset + mask_bytes * i:offset + mask_bytes * (i + 1)], 'little')
+                             for i in range(count)])
+            offset += mask_bytes * count
+    masks = AvailabilityMasks(*sections)
+    return Tournament(max_parallel, days, sessions, contestants, hosts, matches,
+                      MaskAvailability(hosts, masks.hosts_availability, days, sessions),
+                      MaskAvailability(hosts, masks.hosts_preference, days, sessions),
+                      MaskAvailability(contestants, masks.contestants_availability, days, sessions),
+                      MaskAvailability(contestants, masks.contestants_preference, days, sessions),
+                      masks=masks)
+
+
+def load_packed(path: str) -> Tournament:
+    """ Tournament of a packed file, read through a memory map instead of into a bytes copy of the file """
+    if os.path.getsize(path) < HEADER.size:
+        raise ValueError('truncated packed tournament')
+    with open(path, 'rb') as data_file, mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        return parse_packed(buffer)
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    with open(args.data_path, 'r') as data_file:
+        packed = pack_tournament(json.load(data_file))
+    with open(args.o if args.o != None else os.path.splitext(args.data_path)[0] + '.bin', 'wb') as packed_file:
+        packed_file.write(packed)
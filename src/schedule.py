@@ -1,7 +1,8 @@
-from typing import Dict, Iterator, List, Optional, Set, Tuple
-from model import Availability, Contestant, Day, Host, Match, Session, Timeslot, MatchConfig
-from flow import FlowNetwork, Edge
-import itertools
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from model import Availability, AvailabilityMasks, Contestant, Day, Host, Match, Session, Timeslot, TournamentDiff, MatchConfig
+from flow import BACKENDS, FlowNetwork
+from stats import SolverStats
+import time
 
 
 class Schedule:
@@ -58,101 +59,22 @@ class Schedule:
                           contestants_availability: Dict[Contestant, Availability],
                           contestants_preference: Dict[Contestant, Availability]) -> 'Schedule':
         """ Generate schedule based on availability """
-        for host in hosts:
-            hosts_availability[host] = hosts_availability[host] - \
-                hosts_preference[host]
-            for item in hosts_preference[host]:
-                assert isinstance(item, Timeslot)
-
-        for contestant in contestants:
-            contestants_availability[contestant] = contestants_availability[contestant] - \
-                contestants_preference[contestant]
-            for item in contestants_preference[contestant]:
-                assert isinstance(item, Timeslot)
-        # Construct flow network
-        node_gen: Iterator[int] = itertools.count(0)
-        source: int = next(node_gen)
-        sink: int = next(node_gen)
-        match_layer: Dict[Match, int] = {
-            match: next(node_gen) for match in matches}
-        match_config_layer: Dict[MatchConfig, int] = {MatchConfig(host, Timeslot(day, session)): next(node_gen)
-                                                      for day in days for session in sessions for host in hosts}
-        timeslot_layer: Dict[Timeslot, int] = {Timeslot(day, session): next(
-            node_gen) for day in days for session in sessions}
-        day_layer: Dict[Day] = {day: next(node_gen) for day in days}
-        nodes: int = next(node_gen)
-        network: FlowNetwork = FlowNetwork(nodes)
-        match_config_edges: Dict[Tuple[Match, MatchConfig], Edge] = {}
-
-        for match in matches:
-            network.add_edge(source, match_layer[match], capacity=1, cost=0)
-            for host in hosts:
-                # Match held in host preferred time slot
-                preferred_timeslots = hosts_preference[host].intersection(contestants_preference[match[0]].intersection(
-                    contestants_preference[match[1]]))
-                partially_preferred_timeslots = hosts_preference[host].intersection(contestants_preference[match[0]].intersection(
-                    contestants_availability[match[1]]).union(contestants_availability[match[0]].intersection(contestants_preference[match[1]])))
-                available_timeslots = hosts_preference[host].intersection(contestants_availability[match[0]].intersection(
-                    contestants_availability[match[1]]))
-                    
-                for timeslot in preferred_timeslots:
-                    match_config = MatchConfig(host, timeslot)
-                    match_config_edges[(match, match_config)] = network.add_edge(
-                        match_layer[match], match_config_layer[match_config], capacity=1, cost=1+1+1)
-                for timeslot in partially_preferred_timeslots:
-                    match_config = MatchConfig(host, timeslot)
-                    match_config_edges[(match, match_config)] = network.add_edge(
-                        match_layer[match], match_config_layer[match_config], capacity=1, cost=1+1+nodes)
-                for timeslot in available_timeslots:
-                    match_config = MatchConfig(host, timeslot)
-                    match_config_edges[(match, match_config)] = network.add_edge(
-                        match_layer[match], match_config_layer[match_config], capacity=1, cost=1+nodes+nodes)
-
-                preferred_timeslots = hosts_availability[host].intersection(contestants_preference[match[0]].intersection(
-                    contestants_preference[match[1]]))
-                partially_preferred_timeslots = hosts_availability[host].intersection(contestants_preference[match[0]].intersection(
-                    contestants_availability[match[1]]).union(contestants_availability[match[0]].intersection(contestants_preference[match[1]])))
-                available_timeslots = hosts_availability[host].intersection(contestants_availability[match[0]].intersection(
-                    contestants_availability[match[1]]))
-
-                # Match held in host preferred time slot
-                for timeslot in preferred_timeslots:
-                    match_config = MatchConfig(host, timeslot)
-                    match_config_edges[(match, match_config)] = network.add_edge(
-                        match_layer[match], match_config_layer[match_config], capacity=1, cost=nodes+1+1)
-                for timeslot in partially_preferred_timeslots:
-                    match_config = MatchConfig(host, timeslot)
-                    match_config_edges[(match, match_config)] = network.add_edge(
-                        match_layer[match], match_config_layer[match_config], capacity=1, cost=nodes+nodes+1)
-                for timeslot in available_timeslots:
-                    match_config = MatchConfig(host, timeslot)
-                    match_config_edges[(match, match_config)] = network.add_edge(
-                        match_layer[match], match_config_layer[match_config], capacity=1, cost=nodes+nodes+nodes)
-
-        for day in days:
-            network.add_edge(day_layer[day], sink,
-                             capacity=max_per_day, cost=0)
-            for session in sessions:
-                timeslot = Timeslot(day, session)
-                network.add_edge(
-                    timeslot_layer[timeslot], day_layer[day], capacity=max_parallel, cost=0)
-                for host in hosts:
-                    network.add_edge(match_config_layer[MatchConfig(
-                        host, timeslot)], timeslot_layer[timeslot], capacity=max_parallel, cost=0)
-
-        network.min_cost_max_flow(source, sink)
-
-        schedule = Schedule(max_parallel, max_per_day, days,
-                            contestants, hosts, sessions, matches, schedule=[], unscheduled_matches=set(matches), preferred_count=0)
-        for ((match, config), edge) in match_config_edges.items():
-            if edge.flow == 1:
-                schedule.schedule.append((match, config))
-                schedule.preferred_count += edge.cost % nodes
-                schedule.unscheduled_matches.remove(match)
-        # sort by match day, then by match session, then by match host
-        schedule.schedule.sort(key=lambda match: (days.index(
-            match[1].timeslot.day), sessions.index(match[1].timeslot.session), hosts.index(match[1].host)))
-        return schedule
+        return ScheduleInstance(days, contestants, hosts, sessions, matches, hosts_availability, hosts_preference,
+                                contestants_availability, contestants_preference).solve(max_parallel, max_per_day)
+
+    def generate_schedules(bounds: Iterable[Tuple[int, int]],
+                           days: List[Day],
+                           contestants: List[Contestant],
+                           hosts: List[Host],
+                           sessions: List[Session],
+                           matches: List[Match],
+                           hosts_availability: Dict[Host, Availability],
+                           hosts_preference: Dict[Host, Availability],
+                           contestants_availability: Dict[Contestant, Availability],
+                           contestants_preference: Dict[Contestant, Availability]) -> Iterator['Schedule']:
+        """ Generate a schedule for each (max_parallel, max_per_day) in bounds, both must be non-decreasing """
+        return ScheduleInstance(days, contestants, hosts, sessions, matches, hosts_availability, hosts_preference,
+                                contestants_availability, contestants_preference).solve_all(bounds)
 
     def better_than(self, schedule: 'Schedule') -> bool:
         assert self.valid_schedule()
@@ -175,3 +97,482 @@ class Schedule:
             return self.max_per_day < schedule.max_per_day
 
         return False  # two schedules are equally as good
+
+    def to_dict(self) -> Dict[str, Any]:
+        """ Schedule in the json style of the input format, unscheduled matches in match order """
+        assert self.valid_schedule()
+        return {'max_parallel': self.max_parallel,
+                'max_per_day': self.max_per_day,
+                'preferred_count': self.preferred_count,
+                'schedule': [{'contestant1': match[0], 'contestant2': match[1], 'host': config.host,
+                              'day': config.timeslot.day, 'session': config.timeslot.session}
+                             for (match, config) in self.schedule],
+                'unscheduled_matches': [{'contestant1': match[0], 'contestant2': match[1]}
+                                        for match in self.matches if match in self.unscheduled_matches]}
+
+    def merge_schedules(schedules: List['Schedule'], matches: List[Match]) -> 'Schedule':
+        """ Combine schedules of parts of a tournament that share no config, timeslot or day
+
+            matches is the match list of the whole tournament, the scheduled matches are ordered as if the parts had
+            been solved together
+        """
+        assert schedules
+        assert all(schedule.valid_schedule() for schedule in schedules)
+        first = schedules[0]
+        day_index = {day: i for (i, day) in enumerate(first.days)}
+        session_index = {session: i for (i, session) in enumerate(first.sessions)}
+        host_index = {host: i for (i, host) in enumerate(first.hosts)}
+        match_index = {match: i for (i, match) in enumerate(matches)}
+        merged = Schedule(max(schedule.max_parallel for schedule in schedules),
+                          max(schedule.max_per_day for schedule in schedules),
+                          first.days, first.contestants, first.hosts, first.sessions, matches,
+                          schedule=[], unscheduled_matches=set(), preferred_count=0)
+        for schedule in schedules:
+            merged.schedule.extend(schedule.schedule)
+            merged.unscheduled_matches |= schedule.unscheduled_matches
+            merged.preferred_count += schedule.preferred_count
+        # sort by match day, then by match session, then by match host like a single snapshot
+        merged.schedule.sort(key=lambda item: (day_index[item[1].timeslot.day], session_index[item[1].timeslot.session],
+                                               host_index[item[1].host], match_index[item[0]]))
+        return merged
+
+
+class ScheduleInstance:
+    """ Flow network of a tournament with the two bounds left open
+
+        The node layout and the candidate match -> config arcs with their preference costs only depend on the
+        availability, so they are built once. Every (max_parallel, max_per_day) then gets a copy of the arc arrays
+        with its own capacities on the config -> timeslot, timeslot -> day and day -> sink arcs.
+
+        Only configs with a candidate arc get a node, and only timeslots and days with such a config. Kept nodes are
+        numbered in the order of the full layout, so the solver visits them in the same order as without pruning.
+    """
+    days: List[Day]
+    contestants: List[Contestant]
+    hosts: List[Host]
+    sessions: List[Session]
+    matches: List[Match]
+
+    # config of host h at timeslot t is t * len(hosts) + h, timeslot t is day t // len(sessions)
+    nodes: int
+    source: int
+    sink: int
+    match_base: int
+    config_nodes: Dict[int, int]  # node of every config with a candidate arc
+    node_configs: Dict[int, int]  # config of every config node
+    slot_nodes: Dict[int, int]  # node of every timeslot with a config node
+    day_nodes: Dict[int, int]  # node of every day with a timeslot node
+    unpruned_nodes: int  # size of the network with a node for every config, timeslot and day
+    unpruned_edges: int
+    template: FlowNetwork  # network with zero capacity on the bounded arcs
+    match_edges: Dict[Match, List[int]]  # arc source -> match followed by the candidate match -> config arcs
+    parallel_edges: List[int]  # arcs with capacity max_parallel
+    day_edges: List[int]  # arcs with capacity max_per_day
+    miss_cost: int  # cost of every person of a match not in a preferred timeslot, above any preferred count
+    stats: Optional[SolverStats]  # receives build, copy, solve and snapshot times if set
+    backend: str  # name of the min cost max flow engine in flow.BACKENDS
+
+    # preferred timeslots and available but not preferred timeslots of each person as bitmasks over timeslot indices
+    slot_index: Dict[Timeslot, int]
+    host_index: Dict[Host, int]
+    hosts_preferred: List[int]
+    hosts_available: List[int]
+    contestants_preferred: Dict[Contestant, int]
+    contestants_available: Dict[Contestant, int]
+
+    def __init__(self,
+                 days: List[Day],
+                 contestants: List[Contestant],
+                 hosts: List[Host],
+                 sessions: List[Session],
+                 matches: List[Match],
+                 hosts_availability: Dict[Host, Availability],
+                 hosts_preference: Dict[Host, Availability],
+                 contestants_availability: Dict[Contestant, Availability],
+                 contestants_preference: Dict[Contestant, Availability],
+                 stats: Optional[SolverStats] = None,
+                 backend: str = 'ssp',
+                 masks: Optional[AvailabilityMasks] = None) -> None:
+        """ Build the network template, the availability and preference dicts are not modified
+
+            If masks is given the bitmasks are taken from it and the four dicts are not read
+        """
+        start = time.perf_counter()
+        if backend not in BACKENDS:
+            raise ValueError('unknown flow backend {}, expected one of {}'.format(backend, ', '.join(BACKENDS)))
+        self.stats = stats
+        self.backend = backend
+        self.days = days
+        self.contestants = contestants
+        self.hosts = hosts
+        self.sessions = sessions
+        self.matches = list(matches)
+
+        # index timeslots day by day, availability becomes a bitmask over timeslot indices
+        self.slot_index = slot_index = {Timeslot(day, session): len(sessions) * i + j
+                                        for (i, day) in enumerate(days) for (j, session) in enumerate(sessions)}
+        slots: int = len(slot_index)
+        self.host_index = {host: h for (h, host) in enumerate(hosts)}
+        if masks != None:
+            grid = (1 << slots) - 1
+            self.hosts_preferred = [preferred & grid for preferred in masks.hosts_preference]
+            self.hosts_available = [available & grid & ~preferred
+                                    for (available, preferred) in zip(masks.hosts_availability, self.hosts_preferred)]
+            self.contestants_preferred = {contestant: preferred & grid
+                                          for (contestant, preferred) in zip(contestants, masks.contestants_preference)}
+            self.contestants_available = {contestant: available & grid & ~self.contestants_preferred[contestant]
+                                          for (contestant, available) in zip(contestants, masks.contestants_availability)}
+        else:
+            for host in hosts:
+                for item in hosts_preference[host]:
+                    assert isinstance(item, Timeslot)
+            for contestant in contestants:
+                for item in contestants_preference[contestant]:
+                    assert isinstance(item, Timeslot)
+            self.hosts_preferred = [timeslot_mask(hosts_preference[host], slot_index) for host in hosts]
+            self.hosts_available = [timeslot_mask(hosts_availability[host], slot_index) & ~preferred
+                                    for (host, preferred) in zip(hosts, self.hosts_preferred)]
+            self.contestants_preferred = {contestant: timeslot_mask(contestants_preference[contestant], slot_index)
+                                          for contestant in contestants}
+            self.contestants_available = {contestant: timeslot_mask(contestants_availability[contestant], slot_index) & ~self.contestants_preferred[contestant]
+                                          for contestant in contestants}
+
+        # configs some match can use, a host is needed at a timeslot where both contestants of a match are available
+        match_slots: int = 0
+        for (first, second) in matches:
+            match_slots |= ((self.contestants_preferred[first] | self.contestants_available[first]) &
+                            (self.contestants_preferred[second] | self.contestants_available[second]))
+        host_slots = [(preferred | available) & match_slots
+                      for (preferred, available) in zip(self.hosts_preferred, self.hosts_available)]
+
+        # Construct flow network
+        self.source = source = 0
+        self.sink = sink = 1
+        self.match_base = match_base = 2
+        self.config_nodes, self.node_configs, self.slot_nodes, self.day_nodes = {}, {}, {}, {}
+        self.nodes = match_base + len(matches)
+        for slot in range(slots):
+            for (host, mask) in enumerate(host_slots):
+                if mask >> slot & 1:
+                    self.config_nodes[slot * len(hosts) + host] = self.nodes
+                    self.node_configs[self.nodes] = slot * len(hosts) + host
+                    self.nodes += 1
+        for slot in range(slots):
+            if any(mask >> slot & 1 for mask in host_slots):
+                self.slot_nodes[slot] = self.nodes
+                self.nodes += 1
+        for day in range(len(days)):
+            if any(slot in self.slot_nodes for slot in range(len(sessions) * day, len(sessions) * (day + 1))):
+                self.day_nodes[day] = self.nodes
+                self.nodes += 1
+        # costs are the same as in the unpruned layout, so are the ties between them
+        self.unpruned_nodes = self.miss_cost = match_base + len(matches) + slots * len(hosts) + slots + len(days)
+        self.template = network = FlowNetwork(self.nodes)
+        self.match_edges = {}
+        self.parallel_edges = parallel_edges = []
+        self.day_edges = day_edges = []
+
+        for (i, match) in enumerate(matches):
+            self.__add_match(network, match, match_base + i)
+
+        for (day, day_node) in self.day_nodes.items():
+            day_edges.append(network.add_arc(day_node, sink, capacity=0, cost=0))
+            for slot in range(len(sessions) * day, len(sessions) * (day + 1)):
+                if slot not in self.slot_nodes:
+                    continue
+                parallel_edges.append(network.add_arc(self.slot_nodes[slot], day_node, capacity=0, cost=0))
+                for host in range(len(hosts)):
+                    if slot * len(hosts) + host in self.config_nodes:
+                        parallel_edges.append(network.add_arc(
+                            self.config_nodes[slot * len(hosts) + host], self.slot_nodes[slot], capacity=0, cost=0))
+        candidate_edges: int = sum(len(edges) - 1 for edges in self.match_edges.values())
+        self.unpruned_edges = len(matches) + candidate_edges + slots * len(hosts) + slots + len(days)
+        if stats is not None:
+            stats.add_time('build', time.perf_counter() - start)
+            stats.size('unpruned_nodes', self.unpruned_nodes)
+            stats.size('unpruned_arcs', self.unpruned_edges)
+            stats.size('template_nodes', self.nodes)
+            stats.size('template_arcs', len(network.head) // 2)
+
+    def components(self) -> List[List[Match]]:
+        """ Matches split by connected component of the match - config - timeslot - day graph
+
+            Components share no bounded arc, so a min cost flow of the whole network is a min cost flow of every
+            component. Matches without a candidate arc can never be scheduled and come last as one group.
+        """
+        head = self.template.head
+        parent: List[int] = list(range(self.nodes))
+
+        def find(node: int) -> int:
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        for edges in self.match_edges.values():
+            for edge in edges[1:]:
+                parent[find(head[edge])] = find(head[edges[0]])
+        hosts, sessions = len(self.hosts), len(self.sessions)
+        for (config, node) in self.config_nodes.items():
+            parent[find(node)] = find(self.slot_nodes[config // hosts])
+        for (slot, node) in self.slot_nodes.items():
+            parent[find(node)] = find(self.day_nodes[slot // sessions])
+        groups: Dict[int, List[Match]] = {}
+        isolated: List[Match] = []
+        for (match, edges) in self.match_edges.items():
+            if len(edges) == 1:
+                isolated.append(match)
+            else:
+                groups.setdefault(find(head[edges[0]]), []).append(match)
+        return list(groups.values()) + ([isolated] if isolated else [])
+
+    def __candidate_arcs(self, match: Match) -> Iterator[Tuple[int, int]]:
+        """ Config and cost of every match -> config arc of match
+
+            The cost is the number of people of the match in a preferred timeslot plus miss_cost for everyone else
+        """
+        preferred = [self.contestants_preferred[contestant] for contestant in match]
+        available = [self.contestants_available[contestant] for contestant in match]
+        # timeslots by number of contestants preferring them
+        contestant_tiers = ((preferred[0] & preferred[1], 2),
+                            (preferred[0] & available[1] | available[0] & preferred[1], 1),
+                            (available[0] & available[1], 0))
+        hosts, miss_cost = len(self.hosts), self.miss_cost
+        for (host, host_tiers) in enumerate(zip(self.hosts_preferred, self.hosts_available)):
+            for (host_preferred, host_mask) in zip((1, 0), host_tiers):
+                for (contestant_mask, contestants_preferred_count) in contestant_tiers:
+                    preferred_count = host_preferred + contestants_preferred_count
+                    cost = preferred_count + (3 - preferred_count) * miss_cost
+                    timeslots = host_mask & contestant_mask
+                    while timeslots:
+                        lowest = timeslots & -timeslots
+                        timeslots ^= lowest
+                        yield (lowest.bit_length() - 1) * hosts + host, cost
+
+    def __add_match(self, network: FlowNetwork, match: Match, match_node: int) -> None:
+        edges = self.match_edges[match] = [network.add_arc(self.source, match_node, capacity=1, cost=0)]
+        for (config, cost) in self.__candidate_arcs(match):
+            edges.append(network.add_arc(match_node, self.config_nodes[config], capacity=1, cost=cost))
+
+    def update(self, diff: TournamentDiff, networks: Iterable[Tuple[FlowNetwork, int, int]] = ()) -> None:
+        """ Apply diff to the template and to networks copied from it, solved or not
+
+            networks are given with their (max_parallel, max_per_day), which new config, timeslot and day nodes
+            need. Only the arcs of the added and withdrawn matches and of the matches whose candidate arcs changed
+            are touched. Withdrawn arcs keep their ids with zero capacity, so arc ids stay in step across the networks.
+            A solved network keeps its flow on the untouched arcs, the next min_cost_max_flow only repairs the
+            imbalance left by the edit, see FlowNetwork.set_capacity.
+
+            The diff is checked as model.apply_diff checks it before anything is edited, a ValueError for an unknown
+            person or contestant leaves the instance and networks as they were. Withdrawing a match the instance
+            does not have and adding one it has already are no-ops.
+        """
+        start = time.perf_counter()
+        bounded = [(self.template, 0, 0)] + list(networks)
+        networks = [network for (network, _, _) in bounded]
+        for network in networks:
+            assert network.nodes == self.nodes
+        people: Set[str] = set()
+        for timeslots in (diff.added_availability, diff.removed_availability, diff.added_preference,
+                          diff.removed_preference):
+            people.update(timeslots)
+        for person in people:
+            if person not in self.host_index and person not in self.contestants_preferred:
+                raise ValueError('unknown host or contestant {}'.format(person))
+        for match in diff.added_matches:
+            for contestant in match:
+                if contestant not in self.contestants_preferred:
+                    raise ValueError('unknown contestant {}'.format(contestant))
+
+        for match in diff.withdrawn_matches:
+            for edge in self.match_edges.pop(match, ()):
+                for network in networks:
+                    network.set_capacity(edge, 0)
+
+        # edit the bitmasks, edited contestants change their matches, edited hosts change every match
+        edited_matches: Set[Match] = set()
+        for person in people:
+            if person in self.host_index:
+                h = self.host_index[person]
+                self.hosts_preferred[h], self.hosts_available[h] = self.__edit_masks(
+                    diff, person, self.hosts_preferred[h], self.hosts_available[h])
+                edited_matches.update(self.match_edges)
+            if person in self.contestants_preferred:
+                self.contestants_preferred[person], self.contestants_available[person] = self.__edit_masks(
+                    diff, person, self.contestants_preferred[person], self.contestants_available[person])
+                edited_matches.update(match for match in self.match_edges if person in match)
+
+        head, cost = self.template.head, self.template.cost
+        for match in self.match_edges:
+            if match not in edited_matches:
+                continue
+            edges = self.match_edges[match]
+            match_node = head[edges[0]]
+            wanted: Dict[int, int] = dict(self.__candidate_arcs(match))
+            kept: List[int] = [edges[0]]
+            for edge in edges[1:]:
+                config = self.node_configs[head[edge]]
+                if config not in wanted:
+                    for network in networks:
+                        network.set_capacity(edge, 0)
+                    continue
+                if cost[edge] != wanted[config]:
+                    for network in networks:
+                        network.set_cost(edge, wanted[config])
+                del wanted[config]
+                kept.append(edge)
+            for (config, config_cost) in wanted.items():
+                if config not in self.config_nodes:
+                    self.__add_config(bounded, config)
+                # arc arrays are in step, every network hands out the same id
+                for network in networks:
+                    edge = network.add_arc(match_node, self.config_nodes[config], capacity=1, cost=config_cost)
+                kept.append(edge)
+            self.match_edges[match] = kept
+
+        for match in diff.added_matches:
+            if match in self.match_edges:
+                continue
+            for (config, _) in self.__candidate_arcs(match):
+                if config not in self.config_nodes:
+                    self.__add_config(bounded, config)
+            for network in networks:
+                self.__add_match(network, match, network.add_node())
+        # schedules share the match list, so it is replaced instead of edited
+        self.matches = list(self.match_edges)
+        self.nodes = self.template.nodes
+        if self.stats is not None:
+            self.stats.add_time('update', time.perf_counter() - start)
+
+    def __add_config(self, bounded: List[Tuple[FlowNetwork, int, int]], config: int) -> None:
+        """ Add the node of a config pruned at build time, and its timeslot and day if they were pruned as well """
+        slot = config // len(self.hosts)
+        day = slot // len(self.sessions)
+        if day not in self.day_nodes:
+            for (network, max_parallel, max_per_day) in bounded:
+                self.day_nodes[day] = network.add_node()
+                edge = network.add_arc(self.day_nodes[day], self.sink, capacity=max_per_day, cost=0)
+            self.day_edges.append(edge)
+        if slot not in self.slot_nodes:
+            for (network, max_parallel, max_per_day) in bounded:
+                self.slot_nodes[slot] = network.add_node()
+                edge = network.add_arc(self.slot_nodes[slot], self.day_nodes[day], capacity=max_parallel, cost=0)
+            self.parallel_edges.append(edge)
+        for (network, max_parallel, max_per_day) in bounded:
+            self.config_nodes[config] = network.add_node()
+            edge = network.add_arc(self.config_nodes[config], self.slot_nodes[slot], capacity=max_parallel, cost=0)
+        self.parallel_edges.append(edge)
+        self.node_configs[self.config_nodes[config]] = config
+        self.nodes = self.template.nodes
+
+    def resolve(self, network: FlowNetwork, max_parallel: int, max_per_day: int,
+                diff: Optional[TournamentDiff] = None) -> Schedule:
+        """ Solve a network of this instance at the given bounds, applying diff to the instance first if given
+
+            A network kept from an earlier call is warm started, so an edit costs about as many shortest path
+            searches as it moved matches rather than a solve from scratch.
+        """
+        if diff != None:
+            self.update(diff, [(network, max_parallel, max_per_day)])
+        BACKENDS[self.backend](network, self.source, self.sink)
+        return self.schedule(network, max_parallel, max_per_day)
+
+    def __edit_masks(self, diff: TournamentDiff, person: str, preferred: int, available: int) -> Tuple[int, int]:
+        """ Preferred and available but not preferred bitmasks of person after diff """
+        slot_index = self.slot_index
+        added_preference = timeslot_mask(diff.added_preference.get(person, ()), slot_index)
+        removed_availability = timeslot_mask(diff.removed_availability.get(person, ()), slot_index)
+        removed_preference = timeslot_mask(diff.removed_preference.get(person, ()), slot_index)
+        total = (preferred | available | added_preference |
+                 timeslot_mask(diff.added_availability.get(person, ()), slot_index)) & ~removed_availability
+        preferred = (preferred | added_preference) & ~removed_preference & total
+        return preferred, total & ~preferred
+
+    def network(self, max_parallel: int, max_per_day: int) -> FlowNetwork:
+        """ Fresh copy of the template with the bounded arcs set to the given capacities """
+        start = time.perf_counter()
+        network = self.template.copy()
+        for edge in self.parallel_edges:
+            network.capacity[edge] = max_parallel
+        for edge in self.day_edges:
+            network.capacity[edge] = max_per_day
+        network.stats = self.stats
+        if self.stats is not None:
+            self.stats.add_time('copy', time.perf_counter() - start)
+        return network
+
+    def solve(self, max_parallel: int, max_per_day: int) -> Schedule:
+        start = time.perf_counter()
+        network = self.network(max_parallel, max_per_day)
+        BACKENDS[self.backend](network, self.source, self.sink)
+        schedule = self.schedule(network, max_parallel, max_per_day)
+        if self.stats is not None:
+            self.stats.points.append({'max_parallel': max_parallel, 'max_per_day': max_per_day,
+                                      'seconds': time.perf_counter() - start, 'warm': False})
+        return schedule
+
+    def solve_all(self, bounds: Iterable[Tuple[int, int]]) -> Iterator[Schedule]:
+        """ Generate a schedule for each (max_parallel, max_per_day) in bounds, both must be non-decreasing
+
+            The network is solved once for the first bound, every later bound only raises the capacities of the
+            bounded arcs and continues from the previous flow, except with the simplex backend which always starts over
+        """
+        bounds = iter(bounds)
+        max_parallel, max_per_day = next(bounds)
+        start = time.perf_counter()
+        network = self.network(max_parallel, max_per_day)
+        warm = False
+        while True:
+            BACKENDS[self.backend](network, self.source, self.sink)
+            schedule = self.schedule(network, max_parallel, max_per_day)
+            if self.stats is not None:
+                self.stats.points.append({'max_parallel': max_parallel, 'max_per_day': max_per_day,
+                                          'seconds': time.perf_counter() - start, 'warm': warm})
+            yield schedule
+            next_bound = next(bounds, None)
+            if next_bound is None:
+                return
+            assert next_bound[0] >= max_parallel and next_bound[1] >= max_per_day
+            max_parallel, max_per_day = next_bound
+            start = time.perf_counter()
+            warm = True
+            for edge in self.parallel_edges:
+                network.set_capacity(edge, max_parallel)
+            for edge in self.day_edges:
+                network.set_capacity(edge, max_per_day)
+
+    def schedule(self, network: FlowNetwork, max_parallel: int, max_per_day: int) -> Schedule:
+        """ Snapshot of the schedule given by the current flow on the match -> config arcs of network """
+        start = time.perf_counter()
+        hosts, sessions, days, matches = self.hosts, self.sessions, self.days, self.matches
+        schedule = Schedule(max_parallel, max_per_day, days, self.contestants, hosts, sessions, matches,
+                            schedule=[], unscheduled_matches=set(matches), preferred_count=0)
+        used: List[Tuple[int, int, Match]] = []
+        flow, head, cost = network.flow, network.head, network.cost
+        for (match, edges) in self.match_edges.items():
+            if flow[edges[0]] == 0:
+                continue
+            for edge in edges[1:]:
+                if flow[edge] == 1:
+                    (slot, host) = divmod(self.node_configs[head[edge]], len(hosts))
+                    used.append((slot, host, match))
+                    schedule.preferred_count += cost[edge] % self.miss_cost
+                    schedule.unscheduled_matches.remove(match)
+                    break
+        # sort by match day, then by match session, then by match host
+        used.sort(key=lambda config: config[:2])
+        for (slot, host, match) in used:
+            (day, session) = divmod(slot, len(sessions))
+            schedule.schedule.append((match, MatchConfig(hosts[host], Timeslot(days[day], sessions[session]))))
+        if self.stats is not None:
+            self.stats.add_time('snapshot', time.perf_counter() - start)
+        return schedule
+
+
+def timeslot_mask(availability: Availability, slot_index: Dict[Timeslot, int]) -> int:
+    """ Bitmask with bit slot_index[timeslot] set for every timeslot in availability, timeslots off the grid are ignored """
+    mask = 0
+    for timeslot in availability:
+        if timeslot in slot_index:
+            mask |= 1 << slot_index[timeslot]
+    return mask
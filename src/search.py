@@ -0,0 +1,265 @@
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from model import Tournament
+from schedule import Schedule, ScheduleInstance
+from stats import SolverStats
+import math
+import time
+
+# network template of a worker process, built once per worker from the tournament sent by init_worker
+worker_instance: Optional[ScheduleInstance] = None
+
+
+def build_instance(tournament: Tournament, stats: Optional[SolverStats] = None, backend: str = 'ssp') -> ScheduleInstance:
+    return ScheduleInstance(tournament.days, tournament.contestants, tournament.hosts, tournament.sessions,
+                            tournament.matches, tournament.hosts_availability, tournament.hosts_preference,
+                            tournament.contestants_availability, tournament.contestants_preference, stats=stats,
+                            backend=backend, masks=tournament.masks)
+
+
+def sweep(instance: ScheduleInstance, bounds: Iterable[Tuple[int, int]]) -> Optional[Schedule]:
+    """ Best schedule over a non-decreasing run of bounds, solved on one warm-started network """
+    best_schedule: Optional[Schedule] = None
+    for schedule in instance.solve_all(bounds):
+        if best_schedule == None or schedule.better_than(best_schedule):
+            best_schedule = schedule
+    return best_schedule
+
+
+def grid_runs(tournament: Tournament, chunks: int = 1) -> List[List[Tuple[int, int]]]:
+    """ Split the (max_parallel, max_per_day) grid into runs of increasing max_per_day, `chunks` runs per parallel """
+    max_per_day = len(tournament.days) * len(tournament.sessions)
+    size = max(1, math.ceil(max_per_day / chunks))
+    return [[(parallel, per_day) for per_day in range(start, min(start + size, max_per_day + 1))]
+            for parallel in range(1, tournament.max_parallel + 1)
+            for start in range(1, max_per_day + 1, size)]
+
+
+def init_worker(tournament: Tournament, backend: str) -> None:
+    global worker_instance
+    worker_instance = build_instance(tournament, backend=backend)
+
+
+def sweep_worker(bounds: List[Tuple[int, int]], collect_stats: bool) -> Tuple[Optional[Schedule], Optional[SolverStats]]:
+    """ Sweep a run in a worker process, the stats of the run are sent back to be added up """
+    worker_instance.stats = SolverStats() if collect_stats else None
+    return sweep(worker_instance, bounds), worker_instance.stats
+
+
+def exhaustive_search(tournament: Tournament, jobs: int = 1, stats: Optional[SolverStats] = None,
+                      backend: str = 'ssp') -> Optional[Schedule]:
+    """ Try every (max_parallel, max_per_day) pair and return the best schedule
+
+        With jobs > 1 the grid is spread over worker processes. The winning bounds are solved once more from scratch,
+        so the returned schedule does not depend on how the grid was split.
+    """
+    instance = build_instance(tournament, stats, backend)
+    if jobs <= 1:
+        results = [sweep(instance, bounds) for bounds in grid_runs(tournament)]
+    else:
+        runs = grid_runs(tournament, math.ceil(jobs / max(1, tournament.max_parallel)))
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(tournament, backend)) as executor:
+            results = []
+            for (schedule, worker_stats) in executor.map(sweep_worker, runs, [stats is not None] * len(runs)):
+                results.append(schedule)
+                if worker_stats is not None:
+                    stats.merge(worker_stats)
+
+    best_schedule: Optional[Schedule] = None
+    for schedule in results:
+        if schedule != None and (best_schedule == None or schedule.better_than(best_schedule)):
+            best_schedule = schedule
+    if best_schedule == None:
+        return None
+    return instance.solve(best_schedule.max_parallel, best_schedule.max_per_day)
+
+
+def smallest_bound(reaches_best: Callable[[int], bool], high: int) -> int:
+    """ Smallest bound in [1, high] for which reaches_best holds, given that it holds from some bound up to high """
+    low = 1
+    while low < high:
+        middle = (low + high) // 2
+        if reaches_best(middle):
+            high = middle
+        else:
+            low = middle + 1
+    return high
+
+
+def objective(schedule: Schedule) -> Tuple[int, int]:
+    return (len(schedule.unscheduled_matches), schedule.preferred_count)
+
+
+def lexicographic_search(tournament: Tournament, stats: Optional[SolverStats] = None,
+                         backend: str = 'ssp') -> Optional[Schedule]:
+    """ Same result as exhaustive_search with O(log P + log(D * S)) solves
+
+        Scheduled and preferred counts can only improve as the bounds grow, so the loosest bounds give the best
+        achievable pair. Binary search then finds the smallest max_parallel that still reaches it at the loosest
+        max_per_day, followed by the smallest max_per_day under that max_parallel.
+    """
+    max_parallel = tournament.max_parallel
+    max_per_day = len(tournament.days) * len(tournament.sessions)
+    if max_parallel < 1 or max_per_day < 1:
+        return None
+    return bound_search(build_instance(tournament, stats, backend), max_parallel, max_per_day)
+
+
+def bound_search(instance: ScheduleInstance, max_parallel: int, max_per_day: int) -> Schedule:
+    """ Body of lexicographic_search on a built instance """
+    for (schedule, _) in anytime_bound_search(instance, max_parallel, max_per_day):
+        pass
+    return schedule
+
+
+def anytime_search(tournament: Tournament, stats: Optional[SolverStats] = None, backend: str = 'ssp',
+                   time_limit: Optional[float] = None) -> Iterator[Tuple[Schedule, bool]]:
+    """ lexicographic_search that yields every schedule better than all before it, see anytime_bound_search
+
+        With a time limit in seconds the search stops at the first solve that would start after it, the last
+        schedule yielded is then the best found so far and its flag tells whether it is proven to be the best.
+    """
+    max_parallel = tournament.max_parallel
+    max_per_day = len(tournament.days) * len(tournament.sessions)
+    if max_parallel < 1 or max_per_day < 1:
+        return
+    deadline = None if time_limit == None else time.perf_counter() + time_limit
+    yield from anytime_bound_search(build_instance(tournament, stats, backend), max_parallel, max_per_day, deadline)
+
+
+def anytime_bound_search(instance: ScheduleInstance, max_parallel: int, max_per_day: int,
+                         deadline: Optional[float] = None) -> Iterator[Tuple[Schedule, bool]]:
+    """ Incumbents of bound_search paired with whether they are proven best, ending with its result unless stopped
+
+        The loosest bounds come first and already reach the best scheduled and preferred counts, every later solve
+        binary searches a tighter max_parallel, then a tighter max_per_day, and becomes the incumbent when
+        better_than says it beats it. Once both searches end the incumbent is yielded again as proven. The
+        deadline, a time.perf_counter() value, is checked before every solve but the first.
+    """
+    best = instance.solve(max_parallel, max_per_day)
+    yield best, False
+    for tighten_parallel in (True, False):
+        low, high = 1, (best.max_parallel if tighten_parallel else best.max_per_day)
+        while low < high:
+            if deadline != None and time.perf_counter() >= deadline:
+                return
+            middle = (low + high) // 2
+            schedule = instance.solve(middle, max_per_day) if tighten_parallel else instance.solve(best.max_parallel, middle)
+            if schedule.better_than(best):
+                best, high = schedule, middle
+                yield best, False
+            else:
+                low = middle + 1
+    yield best, True
+
+
+def memoized_solve(instance: ScheduleInstance) -> Callable[[int, int], Schedule]:
+    solved: Dict[Tuple[int, int], Schedule] = {}
+
+    def solve(parallel: int, per_day: int) -> Schedule:
+        if (parallel, per_day) not in solved:
+            solved[(parallel, per_day)] = instance.solve(parallel, per_day)
+        return solved[(parallel, per_day)]
+    return solve
+
+
+def parallel_bound(solve: Callable[[int, int], Schedule], max_parallel: int,
+                   max_per_day: int) -> Tuple[int, Tuple[int, int]]:
+    """ Best objective and the smallest max_parallel reaching it at the loosest max_per_day """
+    best = objective(solve(max_parallel, max_per_day))
+    return smallest_bound(lambda middle: objective(solve(middle, max_per_day)) == best, max_parallel), best
+
+
+def per_day_bound(solve: Callable[[int, int], Schedule], parallel: int, best: Tuple[int, int], max_per_day: int) -> int:
+    """ Smallest max_per_day reaching the best objective under max_parallel `parallel` """
+    return smallest_bound(lambda middle: objective(solve(parallel, middle)) == best, max_per_day)
+
+
+def component_parallel(tournament: Tournament, collect_stats: bool,
+                       backend: str) -> Tuple[int, Tuple[int, int], Optional[SolverStats]]:
+    """ parallel_bound of a component in a worker process """
+    stats = SolverStats() if collect_stats else None
+    solve = memoized_solve(build_instance(tournament, stats, backend))
+    return parallel_bound(solve, tournament.max_parallel, len(tournament.days) * len(tournament.sessions)) + (stats,)
+
+
+def component_per_day(tournament: Tournament, parallel: int, best: Tuple[int, int], collect_stats: bool,
+                      backend: str) -> Tuple[int, Optional[SolverStats]]:
+    """ per_day_bound of a component in a worker process """
+    stats = SolverStats() if collect_stats else None
+    solve = memoized_solve(build_instance(tournament, stats, backend))
+    return per_day_bound(solve, parallel, best, len(tournament.days) * len(tournament.sessions)), stats
+
+
+def component_solve(tournament: Tournament, parallel: int, per_day: int, collect_stats: bool,
+                    backend: str) -> Tuple[Schedule, Optional[SolverStats]]:
+    stats = SolverStats() if collect_stats else None
+    return build_instance(tournament, stats, backend).solve(parallel, per_day), stats
+
+
+def component_search(tournament: Tournament, jobs: int = 1, stats: Optional[SolverStats] = None,
+                     backend: str = 'ssp') -> Optional[Schedule]:
+    """ lexicographic_search on every connected component of the network, optionally in worker processes
+
+        The objective of the whole tournament is the sum over components, so it reaches its best exactly when every
+        component does. The smallest bounds of the whole tournament are then the largest of the smallest bounds of
+        the components, found in two rounds: max_parallel first, then max_per_day under the common max_parallel.
+        Worker processes rebuild the network of their component in every round, a serial search keeps them.
+    """
+    max_parallel = tournament.max_parallel
+    max_per_day = len(tournament.days) * len(tournament.sessions)
+    if max_parallel < 1 or max_per_day < 1:
+        return None
+    instance = build_instance(tournament, stats, backend)
+    parts = [replace(tournament, matches=matches) for matches in instance.components()]
+    if len(parts) <= 1:
+        return bound_search(instance, max_parallel, max_per_day)
+
+    if jobs <= 1:
+        solves = [memoized_solve(build_instance(part, stats, backend)) for part in parts]
+        bounds = [parallel_bound(solve, max_parallel, max_per_day) for solve in solves]
+        parallel = max(part_parallel for (part_parallel, _) in bounds)
+        per_day = max(per_day_bound(solve, parallel, best, max_per_day) for (solve, (_, best)) in zip(solves, bounds))
+        return Schedule.merge_schedules([solve(parallel, per_day) for solve in solves], tournament.matches)
+
+    def add_stats(part_stats: Optional[SolverStats]) -> None:
+        if part_stats is not None:
+            stats.merge(part_stats)
+
+    collect_stats = [stats is not None] * len(parts)
+    backends = [backend] * len(parts)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        parallel, bests = 1, []
+        for (part_parallel, best, part_stats) in executor.map(component_parallel, parts, collect_stats, backends):
+            parallel = max(parallel, part_parallel)
+            bests.append(best)
+            add_stats(part_stats)
+        per_day = 1
+        for (part_per_day, part_stats) in executor.map(component_per_day, parts, [parallel] * len(parts), bests,
+                                                       collect_stats, backends):
+            per_day = max(per_day, part_per_day)
+            add_stats(part_stats)
+        schedules = []
+        for (schedule, part_stats) in executor.map(component_solve, parts, [parallel] * len(parts),
+                                                   [per_day] * len(parts), collect_stats, backends):
+            schedules.append(schedule)
+            add_stats(part_stats)
+    return Schedule.merge_schedules(schedules, tournament.matches)
+
+
+# names of the searches run_search knows, as in main.py's --search
+SEARCHES: List[str] = ['lexicographic', 'components', 'exhaustive']
+
+
+def run_search(tournament: Tournament, search: str = 'lexicographic', jobs: int = 1,
+               stats: Optional[SolverStats] = None, backend: str = 'ssp') -> Optional[Schedule]:
+    """ Best schedule of tournament with the named search """
+    if search == 'exhaustive':
+        return exhaustive_search(tournament, jobs=jobs, stats=stats, backend=backend)
+    if search == 'components':
+        return component_search(tournament, jobs=jobs, stats=stats, backend=backend)
+    if search == 'lexicographic':
+        return lexicographic_search(tournament, stats=stats, backend=backend)
+    raise ValueError('unknown search {}, expected one of {}'.format(search, ', '.join(SEARCHES)))
+
@@ -0,0 +1,317 @@
+from typing import Any, Dict, Generic, Hashable, List, Optional, Tuple, TypeVar, Union
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flow import BACKENDS
+from loader import parse_diff, parse_names, parse_tournament
+from model import Tournament, apply_diff
+from packed import is_packed, load_packed
+from schedule import ScheduleInstance
+from search import bound_search, build_instance
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import time
+
+# command line config
+parser: argparse.ArgumentParser = argparse.ArgumentParser(
+    description='Serve schedules of tournaments kept in memory, one json request and response per line')
+parser.add_argument('--socket', type=str, help='listen on a unix socket at this path instead of tcp')
+parser.add_argument('--host', type=str, default='127.0.0.1', help='tcp address to listen on')
+parser.add_argument('--port', type=int, default=8765, help='tcp port to listen on')
+parser.add_argument('--jobs', type=int, default=1, help='number of worker processes solving requests')
+parser.add_argument('--cache', type=int, default=256, help='number of schedules kept, a quarter as many tournaments')
+
+Key = TypeVar('Key', bound=Hashable)
+Value = TypeVar('Value')
+
+
+class LRUCache(Generic[Key, Value]):
+    """ Dict of at most capacity items that drops the least recently used item first """
+    capacity: int
+    items: 'OrderedDict[Key, Value]'
+    hits: int
+    misses: int
+
+    def __init__(self, capacity: int) -> None:
+        assert capacity >= 1
+        self.capacity = capacity
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Key) -> Optional[Value]:
+        if key not in self.items:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.items.move_to_end(key)
+        return self.items[key]
+
+    def put(self, key: Key, value: Value) -> None:
+        self.items[key] = value
+        self.items.move_to_end(key)
+        while len(self.items) > self.capacity:
+            self.items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def to_dict(self) -> Dict[str, int]:
+        return {'size': len(self.items), 'capacity': self.capacity, 'hits': self.hits, 'misses': self.misses}
+
+
+# tournaments and network templates of a worker process, keyed by tournament hash and by hash and backend
+worker_tournaments: LRUCache[str, Tournament] = LRUCache(8)
+worker_instances: LRUCache[Tuple[str, str], ScheduleInstance] = LRUCache(8)
+
+
+def init_worker(capacity: int) -> None:
+    global worker_tournaments, worker_instances
+    worker_tournaments = LRUCache(capacity)
+    worker_instances = LRUCache(capacity)
+
+
+def solve_worker(key: str, source: Union[None, Tournament, Tuple[str, Any, List[str]]], backend: str,
+                 max_parallel: int, max_per_day: Optional[int]) -> Optional[Tuple[Dict[str, Any], bool]]:
+    """ Schedule of a tournament as a dict and whether the network template was already built
+
+        source is the tournament, or how to make it from a base tournament as (base key, diff, added hosts), or
+        None. None is returned if the worker keeps neither the tournament, its template nor the base it is made
+        from, and the tournament is then sent along, so a worker that has seen a tournament only receives its key.
+        Without max_per_day the smallest bounds up to max_parallel reaching the best schedule are searched, as
+        lexicographic_search does, otherwise the given bounds are solved. The template is kept for later requests.
+    """
+    instance = worker_instances.get((key, backend))
+    hot = instance != None
+    if instance == None:
+        tournament = worker_tournaments.get(key)
+        if isinstance(source, Tournament):
+            tournament = source
+        elif tournament == None and source != None:
+            (base_key, diff, added_hosts) = source
+            base = worker_tournaments.get(base_key)
+            if base != None:
+                tournament = apply_diff(base, parse_diff(diff), added_hosts)
+        if tournament == None:
+            return None
+        worker_tournaments.put(key, tournament)
+        instance = build_instance(tournament, backend=backend)
+        worker_instances.put((key, backend), instance)
+    per_day = len(instance.days) * len(instance.sessions)
+    if max_parallel < 1 or per_day < 1:
+        raise ValueError('no timeslot can hold a match')
+    if max_per_day == None:
+        return bound_search(instance, max_parallel, per_day).to_dict(), hot
+    return instance.solve(max_parallel, max_per_day).to_dict(), hot
+
+
+def tournament_hash(data: Any) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+class ScheduleServer:
+    """ Answers load, solve, whatif and stats requests over json lines
+
+        Parsed tournaments are kept by the hash of their json, what-if tournaments by the hash of their base and of
+        the diff, so repeating a question costs no parsing. Schedules are kept by tournament, backend and bounds.
+        Solving runs in worker processes that keep the tournaments they are sent and the network templates they
+        build. Workers are sent a key first and a what-if as its base key and diff, the tournament itself is only
+        pickled when the worker answers that it has neither. The event loop only parses, looks up caches and writes
+        responses, so requests are answered concurrently. Identical requests that arrive while the first is solving
+        wait for its result instead of solving again.
+    """
+    tournaments: LRUCache[str, Tournament]
+    schedules: LRUCache[Tuple[str, str, int, Optional[int]], Dict[str, Any]]
+    recipes: LRUCache[str, Tuple[str, Any, List[str]]]  # base key, diff and added hosts of what-if tournaments
+    pending: Dict[Tuple[str, str, int, Optional[int]], 'asyncio.Future[Dict[str, Any]]']
+    executor: Executor
+    jobs: int  # number of worker processes
+    cache: int  # number of schedules kept
+
+    def __init__(self, jobs: int = 1, cache: int = 256) -> None:
+        self.tournaments = LRUCache(max(1, cache // 4))
+        self.schedules = LRUCache(cache)
+        self.recipes = LRUCache(max(1, cache // 4))
+        self.pending = {}
+        self.jobs = jobs
+        self.cache = cache
+        self.executor = self.new_executor()
+
+    def new_executor(self) -> Executor:
+        # forked workers would inherit the sockets of open connections and keep them open after the server closes them
+        return ProcessPoolExecutor(max_workers=self.jobs, mp_context=multiprocessing.get_context('forkserver'),
+                                   initializer=init_worker, initargs=(max(1, self.cache // (4 * self.jobs)),))
+
+    def close(self) -> None:
+        self.executor.shutdown()
+
+    async def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """ Response to a request, errors are reported in the response rather than raised """
+        start = time.perf_counter()
+        response: Dict[str, Any] = {'id': request.get('id'), 'ok': True}
+        try:
+            op = request.get('op')
+            if op == 'load':
+                response['instance'] = await self.load(request)
+            elif op == 'solve':
+                response.update(await self.solve(request['instance'], request))
+            elif op == 'whatif':
+                key = await self.whatif(request['instance'], request.get('diff', {}), request.get('added_hosts', []))
+                response['instance'] = key
+                response.update(await self.solve(key, request))
+            elif op == 'stats':
+                response['tournaments'] = self.tournaments.to_dict()
+                response['schedules'] = self.schedules.to_dict()
+            else:
+                raise ValueError('unknown op {}'.format(op))
+        except Exception as error:
+            response = {'id': request.get('id'), 'ok': False, 'error': '{}: {}'.format(type(error).__name__, error)}
+        response['seconds'] = time.perf_counter() - start
+        return response
+
+    async def load(self, request: Dict[str, Any]) -> str:
+        """ Hash of the tournament given inline as data or read from path, parsed unless already kept
+
+            A packed file is kept by the hash of its bytes, it is not converted back to json. Reading, hashing and
+            parsing run in a thread, so other clients are answered meanwhile.
+        """
+        data = request.get('data')
+        if data == None and await asyncio.to_thread(is_packed, request['path']):
+            key, tournament = await asyncio.to_thread(read_packed, request['path'])
+            if self.tournaments.get(key) == None:
+                self.tournaments.put(key, tournament)
+            return key
+        if data == None:
+            data = await asyncio.to_thread(read_json, request['path'])
+        key = await asyncio.to_thread(tournament_hash, data)
+        if self.tournaments.get(key) == None:
+            self.tournaments.put(key, await asyncio.to_thread(parse_tournament, data))
+        return key
+
+    def tournament(self, key: str) -> Tournament:
+        tournament = self.tournaments.get(key)
+        if tournament == None:
+            raise KeyError('unknown or evicted instance {}, load it again'.format(key))
+        return tournament
+
+    async def whatif(self, key: str, diff: Any, added_hosts: Any) -> str:
+        """ Hash of the base tournament with diff applied, see loader.parse_diff and model.apply_diff
+
+            The edit copies every availability set of the base, so it runs in a thread like parsing in load
+        """
+        parsed_diff, added_hosts = parse_diff(diff), parse_names(added_hosts, 'added_hosts')
+        whatif_key = tournament_hash({'base': key, 'diff': diff, 'added_hosts': added_hosts})
+        if self.tournaments.get(whatif_key) == None:
+            tournament = self.tournament(key)
+            self.tournaments.put(whatif_key, await asyncio.to_thread(apply_diff, tournament, parsed_diff, added_hosts))
+        self.recipes.put(whatif_key, (key, diff, added_hosts))
+        return whatif_key
+
+    async def solve(self, key: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        """ Schedule of a kept tournament
+
+            max_parallel defaults to the one of the tournament, max_per_day to searching the smallest bounds
+        """
+        tournament = self.tournament(key)
+        backend = request.get('backend', 'ssp')
+        if backend not in BACKENDS:
+            raise ValueError('unknown flow backend {}, expected one of {}'.format(backend, ', '.join(BACKENDS)))
+        max_parallel = int(request.get('max_parallel', tournament.max_parallel))
+        max_per_day = request.get('max_per_day')
+        if max_per_day != None:
+            max_per_day = int(max_per_day)
+        solve_key = (key, backend, max_parallel, max_per_day)
+        schedule = self.schedules.get(solve_key)
+        if schedule != None:
+            return {'schedule': schedule, 'cached': True}
+        if solve_key in self.pending:
+            return {'schedule': await asyncio.shield(self.pending[solve_key]), 'cached': True}
+
+        future = self.pending[solve_key] = asyncio.get_running_loop().create_future()
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.executor, solve_worker, key, self.recipes.get(key), backend,
+                                                max_parallel, max_per_day)
+            if result == None:
+                result = await loop.run_in_executor(self.executor, solve_worker, key, tournament, backend,
+                                                    max_parallel, max_per_day)
+            schedule, hot = result
+        except Exception as error:
+            if isinstance(error, BrokenProcessPool):
+                # a worker died, later requests get a fresh pool instead of failing as well
+                self.executor.shutdown(wait=False)
+                self.executor = self.new_executor()
+            future.set_exception(error)
+            # retrieved here so that a future nobody else waits on does not log a warning
+            future.exception()
+            raise
+        else:
+            future.set_result(schedule)
+            self.schedules.put(solve_key, schedule)
+        finally:
+            if not future.done():
+                future.cancel()
+            del self.pending[solve_key]
+        return {'schedule': schedule, 'cached': False, 'hot': hot}
+
+    async def serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """ Answer the requests of one connection, each as soon as it is done and tagged with its id """
+        tasks = set()
+        lock = asyncio.Lock()
+
+        async def answer(line: bytes) -> None:
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError('request is not a json object')
+            except ValueError as error:
+                response = {'id': None, 'ok': False, 'error': 'ValueError: {}'.format(error)}
+            else:
+                response = await self.handle(request)
+            async with lock:
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    task = asyncio.create_task(answer(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path: Optional[str] = None, host: str = '127.0.0.1', port: int = 8765) -> None:
+        if socket_path != None:
+            server = await asyncio.start_unix_server(self.serve_client, path=socket_path, limit=1 << 26)
+        else:
+            server = await asyncio.start_server(self.serve_client, host, port, limit=1 << 26)
+        async with server:
+            await server.serve_forever()
+
+
+def read_json(path: str) -> Any:
+    with open(path, 'r') as data_file:
+        return json.load(data_file)
+
+
+def read_packed(path: str) -> Tuple[str, Tournament]:
+    with open(path, 'rb') as data_file:
+        key = hashlib.sha256(data_file.read()).hexdigest()
+    return key, load_packed(path)
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    schedule_server = ScheduleServer(jobs=args.jobs, cache=args.cache)
+    try:
+        asyncio.run(schedule_server.serve(args.socket, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        schedule_server.close()
@@ -0,0 +1,50 @@
+from typing import Any, Dict, Iterator, List
+from contextlib import contextmanager
+import time
+
+
+class SolverStats:
+    """ Counters, sizes and wall times of the scheduler, added up over every network it is attached to
+
+        Components leave stats as None by default and only report when a SolverStats is passed in,
+        so the counting costs nothing unless asked for.
+    """
+    counters: Dict[str, int]  # e.g. searches, heap_pops, relaxations, augmentations
+    sizes: Dict[str, int]  # largest network seen, nodes and arcs
+    timings: Dict[str, float]  # wall time per phase in seconds
+    points: List[Dict[str, Any]]  # wall time of every solved (max_parallel, max_per_day)
+
+    def __init__(self) -> None:
+        self.counters = {}
+        self.sizes = {}
+        self.timings = {}
+        self.points = []
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def size(self, name: str, value: int) -> None:
+        self.sizes[name] = max(self.sizes.get(name, 0), value)
+
+    def add_time(self, name: str, seconds: float) -> None:
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def merge(self, other: 'SolverStats') -> None:
+        for (name, amount) in other.counters.items():
+            self.count(name, amount)
+        for (name, value) in other.sizes.items():
+            self.size(name, value)
+        for (name, seconds) in other.timings.items():
+            self.add_time(name, seconds)
+        self.points.extend(other.points)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'counters': self.counters, 'sizes': self.sizes, 'timings': self.timings, 'points': self.points}
@@ -1,8 +1,91 @@
+from dataclasses import replace
 from flow import FlowNetwork
+import asyncio
+import copy
+import io
+import json
+import math
+import os
+import random
+import tempfile
 import unittest
-from model import Timeslot
+import unittest.mock
+from model import Timeslot, Tournament, TournamentDiff
+from model import apply_diff as edit_tournament
 
-from schedule import Schedule
+from schedule import Schedule, ScheduleInstance
+from generate import generate_data
+from loader import load_tournament, parse_diff, parse_tournament
+from packed import pack_tournament
+from stats import SolverStats
+from batch import solve_batch, solve_file
+from server import ScheduleServer, init_worker, solve_worker
+from search import anytime_search, build_instance, component_search, exhaustive_search, lexicographic_search
+
+
+def reference_min_cost_max_flow(nodes, edges, source, sink):
+    residual = []
+    for (u, v, capacity, cost) in edges:
+        residual.append([u, v, capacity, cost])
+        residual.append([v, u, 0, -cost])
+    max_flow, min_cost = 0, 0
+    while True:
+        distance = [math.inf] * nodes
+        parent = [None] * nodes
+        distance[source] = 0
+        for _ in range(nodes):
+            for (i, (u, v, capacity, cost)) in enumerate(residual):
+                if capacity > 0 and distance[u] + cost < distance[v]:
+                    distance[v] = distance[u] + cost
+                    parent[v] = i
+        if distance[sink] == math.inf:
+            return (max_flow, min_cost)
+        path, node = [], sink
+        while node != source:
+            path.append(parent[node])
+            node = residual[parent[node]][0]
+        flow = min(residual[i][2] for i in path)
+        for i in path:
+            residual[i][2] -= flow
+            residual[i ^ 1][2] += flow
+        max_flow += flow
+        min_cost += flow * distance[sink]
+
+
+def random_instance(generator, matches=8, contestants=6, hosts=3, days=3, sessions=3, density=0.5):
+    days = ["day{}".format(i) for i in range(days)]
+    sessions = ["session{}".format(i) for i in range(sessions)]
+    contestants = ["contestant{}".format(i) for i in range(contestants)]
+    hosts = ["host{}".format(i) for i in range(hosts)]
+    timeslots = [Timeslot(day, session) for day in days for session in sessions]
+
+    def availability(people):
+        available = {person: {timeslot for timeslot in timeslots if generator.random() < density} for person in people}
+        preferred = {person: {timeslot for timeslot in timeslots if timeslot in available[person] and generator.random() < 0.5}
+                     for person in people}
+        return available, preferred
+    hosts_availability, hosts_preference = availability(hosts)
+    contestants_availability, contestants_preference = availability(contestants)
+    return dict(days=days, contestants=contestants, hosts=hosts, sessions=sessions,
+                matches=generator.sample([(a, b) for a in contestants for b in contestants if a < b], matches),
+                hosts_availability=hosts_availability, hosts_preference=hosts_preference,
+                contestants_availability=contestants_availability, contestants_preference=contestants_preference)
+
+
+def apply_diff(instance, diff):
+    """Edited copy of the keyword arguments of an instance, spelled out with plain set operations"""
+    instance = copy.deepcopy(instance)
+    for (availability, preference) in (('hosts_availability', 'hosts_preference'),
+                                       ('contestants_availability', 'contestants_preference')):
+        for person in instance[availability]:
+            available = instance[availability][person] | instance[preference][person]
+            available |= diff.added_availability.get(person, set()) | diff.added_preference.get(person, set())
+            available -= diff.removed_availability.get(person, set())
+            preferred = (instance[preference][person] | diff.added_preference.get(person, set())) & available
+            preferred -= diff.removed_preference.get(person, set())
+            instance[availability][person], instance[preference][person] = available, preferred
+    instance['matches'] = [match for match in instance['matches'] if match not in diff.withdrawn_matches] + diff.added_matches
+    return instance
 
 
 class FlowTest(unittest.TestCase):
@@ -12,14 +95,139 @@ class FlowTest(unittest.TestCase):
         source = 4 - 1  # -1 from 1-based to 0-based
         sink = 3 - 1
         network = FlowNetwork(nodes)
-        network.add_edge(4-1, 2-1, 30, 2)
-        network.add_edge(4-1, 3-1, 20, 3)
+        first = network.add_edge(4-1, 2-1, 30, 2)
+        second = network.add_edge(4-1, 3-1, 20, 3)
         network.add_edge(2-1, 3-1, 20, 1)
         network.add_edge(2-1, 1-1, 30, 9)
         network.add_edge(1-1, 3-1, 40, 5)
         flow, cost = network.min_cost_max_flow(source, sink)
         self.assertEqual(flow, 50)
         self.assertEqual(cost, 280)
+        # add_edge returns views that read the solved flow
+        self.assertEqual((first.u, first.v, first.capacity), (4-1, 2-1, 30))
+        self.assertEqual(first.flow + second.flow, 50)
+
+    def test_random_cases(self):
+        """Cross check against successive shortest paths with Bellman-Ford"""
+        generator = random.Random(2020)
+        for _ in range(200):
+            nodes = generator.randint(2, 12)
+            edges = [(generator.randrange(nodes), generator.randrange(nodes), generator.randint(0, 5), generator.randint(0, 10))
+                     for _ in range(generator.randint(0, 40))]
+            network = FlowNetwork(nodes)
+            for (u, v, capacity, cost) in edges:
+                network.add_edge(u, v, capacity, cost)
+            self.assertEqual(network.min_cost_max_flow(0, nodes - 1),
+                             reference_min_cost_max_flow(nodes, edges, 0, nodes - 1))
+
+    def test_negative_costs(self):
+        """Negative costs without negative cycles need the initial potential pass"""
+        generator = random.Random(2021)
+        for _ in range(200):
+            nodes = generator.randint(2, 12)
+            edges = [tuple(sorted(generator.sample(range(nodes), 2))) + (generator.randint(0, 5), generator.randint(-10, 10))
+                     for _ in range(generator.randint(0, 40))]
+            network = FlowNetwork(nodes)
+            for (u, v, capacity, cost) in edges:
+                network.add_edge(u, v, capacity, cost)
+            self.assertEqual(network.min_cost_max_flow(0, nodes - 1),
+                             reference_min_cost_max_flow(nodes, edges, 0, nodes - 1))
+
+    def test_raise_capacity(self):
+        """Warm started solve after raising capacities matches a cold solve"""
+        generator = random.Random(2022)
+        for _ in range(200):
+            nodes = generator.randint(2, 12)
+            edges = [(generator.randrange(nodes), generator.randrange(nodes), generator.randint(0, 5), generator.randint(0, 10))
+                     for _ in range(generator.randint(0, 40))]
+            network = FlowNetwork(nodes)
+            ids = [network.add_arc(u, v, capacity, cost) for (u, v, capacity, cost) in edges]
+            network.min_cost_max_flow(0, nodes - 1)
+            for _ in range(3):
+                for i in generator.sample(range(len(edges)), len(edges) // 3):
+                    (u, v, capacity, cost) = edges[i]
+                    edges[i] = (u, v, capacity + generator.randint(0, 3), cost)
+                    network.set_capacity(ids[i], edges[i][2])
+                self.assertEqual(network.min_cost_max_flow(0, nodes - 1),
+                                 reference_min_cost_max_flow(nodes, edges, 0, nodes - 1))
+
+    def test_edit_solved(self):
+        """Warm started solve after lowering capacities, changing costs and adding arcs matches a cold solve"""
+        generator = random.Random(2029)
+        for _ in range(200):
+            nodes = generator.randint(2, 12)
+            edges = [(generator.randrange(nodes), generator.randrange(nodes), generator.randint(0, 5), generator.randint(0, 10))
+                     for _ in range(generator.randint(0, 40))]
+            network = FlowNetwork(nodes)
+            ids = [network.add_arc(u, v, capacity, cost) for (u, v, capacity, cost) in edges]
+            sink = nodes - 1
+            network.min_cost_max_flow(0, sink)
+            for _ in range(3):
+                for i in generator.sample(range(len(edges)), len(edges) // 3):
+                    (u, v, capacity, cost) = edges[i]
+                    edges[i] = (u, v, generator.randint(0, 5), generator.randint(0, 10))
+                    network.set_capacity(ids[i], edges[i][2])
+                    network.set_cost(ids[i], edges[i][3])
+                if generator.random() < 0.5:
+                    network.add_node()
+                    nodes += 1
+                for _ in range(generator.randint(0, 3)):
+                    edges.append((generator.randrange(nodes), generator.randrange(nodes), generator.randint(0, 5), generator.randint(0, 10)))
+                    ids.append(network.add_arc(*edges[-1]))
+                self.assertEqual(network.min_cost_max_flow(0, sink),
+                                 reference_min_cost_max_flow(nodes, edges, 0, sink))
+
+    def test_network_simplex(self):
+        """Network simplex agrees with the reference and leaves potentials that min_cost_max_flow can warm start from"""
+        generator = random.Random(2033)
+        for _ in range(200):
+            nodes = generator.randint(2, 12)
+            # shifting non-negative costs by node potentials gives negative costs but no negative cycles
+            shift = [generator.randint(-5, 5) for _ in range(nodes)]
+            edges = [(u, v, generator.randint(0, 5), generator.randint(0, 10) + shift[u] - shift[v])
+                     for (u, v) in ((generator.randrange(nodes), generator.randrange(nodes))
+                                    for _ in range(generator.randint(0, 40)))]
+            network = FlowNetwork(nodes)
+            ids = [network.add_arc(u, v, capacity, cost) for (u, v, capacity, cost) in edges]
+            self.assertEqual(network.network_simplex(0, nodes - 1),
+                             reference_min_cost_max_flow(nodes, edges, 0, nodes - 1))
+            for edge in network.get_edges():
+                self.assertTrue(edge.is_valid() and edge.flow == -edge.backward_edge.flow)
+            for i in generator.sample(range(len(edges)), len(edges) // 3):
+                (u, v, capacity, cost) = edges[i]
+                edges[i] = (u, v, capacity + generator.randint(0, 3), cost)
+                network.set_capacity(ids[i], edges[i][2])
+            self.assertEqual(network.min_cost_max_flow(0, nodes - 1),
+                             reference_min_cost_max_flow(nodes, edges, 0, nodes - 1))
+
+    def test_float_costs(self):
+        """Network simplex ends on float costs whose reduced costs carry round-off, and the cross check accepts it"""
+        # seed 457 used to pivot forever on reduced costs of about -1e-16
+        for seed in range(440, 480):
+            generator = random.Random(seed)
+            nodes = 10
+            # the reference gets the same costs in integer tenths, its Bellman-Ford is not safe from round-off
+            edges = [(generator.randrange(nodes), generator.randrange(nodes), generator.randint(0, 5),
+                      generator.choice([1, 2, 3, 7, 11, 25])) for _ in range(generator.randint(0, 60))]
+            networks = [FlowNetwork(nodes) for _ in range(2)]
+            for network in networks:
+                for (u, v, capacity, cost) in edges:
+                    network.add_arc(u, v, capacity, cost / 10)
+            flow, cost = reference_min_cost_max_flow(nodes, edges, 0, nodes - 1)
+            cost /= 10
+            for (result_flow, result_cost) in (networks[0].network_simplex(0, nodes - 1),
+                                               networks[1].cross_check(0, nodes - 1)):
+                self.assertEqual(result_flow, flow)
+                self.assertAlmostEqual(result_cost, cost)
+
+    def test_cross_check(self):
+        """The check backend raises when the engines disagree, also under python -O"""
+        network = FlowNetwork(2)
+        network.add_arc(0, 1, 3, 2)
+        self.assertEqual(network.copy().cross_check(0, 1), (3, 6))
+        with unittest.mock.patch.object(FlowNetwork, 'network_simplex', return_value=(3, 5)):
+            with self.assertRaises(RuntimeError):
+                network.cross_check(0, 1)
 
 
 class TestSchedule(unittest.TestCase):
@@ -44,5 +252,453 @@ class TestSchedule(unittest.TestCase):
                                                       "11/7", "Evening"), Timeslot("11/7", "Night")]), "chengheichit": set([Timeslot("10/7", "Afternoon"),  Timeslot("12/7", "Afternoon"), Timeslot("12/7", "Evening"), Timeslot("12/7", "Night")]), "ethening": set([Timeslot("10/7", "Afternoon"), Timeslot("10/7", "Evening"), Timeslot("10/7", "Night"), Timeslot("11/7", "Afternoon"), Timeslot(
                                                           "11/7", "Evening"), Timeslot("12/7", "Night")])},
                                               contestants_preference={"lckcode": set([Timeslot("10/7", "Afternoon"), Timeslot("11/7", "Night"), Timeslot("12/7", "Evening")]), "benson1029": set([Timeslot("11/7", "Night")]), "chengheichit": set([Timeslot("10/7", "Afternoon"), Timeslot("12/7", "Night")]), "ethening": set([Timeslot("10/7", "Afternoon"), Timeslot("10/7", "Evening"), Timeslot("11/7", "Afternoon"), Timeslot("12/7", "Night")])})
-        self.assertEqual(schedule.preferred_count, 9)
+        self.assertEqual(schedule.preferred_count, 10)
         self.assertEqual(len(schedule.unscheduled_matches), 0)
+
+    def test_generate_schedules(self):
+        """Warm started sweep over max_per_day agrees with solving every bound from scratch"""
+        generator = random.Random(2023)
+        for _ in range(20):
+            instance = random_instance(generator)
+            bounds = [(1, max_per_day) for max_per_day in range(1, 6)] + [(2, 5), (2, 9), (3, 9)]
+            for ((parallel, max_per_day), schedule) in zip(bounds, Schedule.generate_schedules(bounds, **instance)):
+                expected = Schedule.generate_schedule(parallel, max_per_day, **instance)
+                self.assertEqual(schedule.preferred_count, expected.preferred_count)
+                self.assertEqual(len(schedule.unscheduled_matches), len(expected.unscheduled_matches))
+
+    def test_generate_schedule_keeps_input(self):
+        instance = random_instance(random.Random(2024))
+        expected = copy.deepcopy(instance)
+        Schedule.generate_schedule(2, 3, **instance)
+        self.assertEqual(instance, expected)
+
+    def test_parallel_search(self):
+        """Spreading the sweep over worker processes picks the same schedule as the serial sweep"""
+        generator = random.Random(2025)
+        for _ in range(3):
+            tournament = Tournament(max_parallel=2, **random_instance(generator))
+            serial = exhaustive_search(tournament)
+            parallel = exhaustive_search(tournament, jobs=3)
+            self.assertEqual((serial.max_parallel, serial.max_per_day, serial.preferred_count, serial.schedule),
+                             (parallel.max_parallel, parallel.max_per_day, parallel.preferred_count, parallel.schedule))
+
+    def test_lexicographic_search(self):
+        """Binary searching the bounds picks the same schedule as trying all of them"""
+        generator = random.Random(2026)
+        for _ in range(20):
+            tournament = Tournament(max_parallel=3, **random_instance(generator, matches=generator.randint(1, 12),
+                                                                      density=generator.uniform(0.2, 0.8)))
+            exhaustive = exhaustive_search(tournament)
+            lexicographic = lexicographic_search(tournament)
+            self.assertEqual((exhaustive.max_parallel, exhaustive.max_per_day, exhaustive.preferred_count, exhaustive.schedule),
+                             (lexicographic.max_parallel, lexicographic.max_per_day, lexicographic.preferred_count, lexicographic.schedule))
+
+    def test_anytime_search(self):
+        """Incumbents keep improving up to the lexicographic_search result, a time limit stops at the loosest bounds"""
+        generator = random.Random(2035)
+        for _ in range(10):
+            tournament = Tournament(max_parallel=3, **random_instance(generator, matches=generator.randint(1, 12),
+                                                                      density=generator.uniform(0.2, 0.8)))
+            incumbents = list(anytime_search(tournament))
+            self.assertEqual([proven for (_, proven) in incumbents], [False] * (len(incumbents) - 1) + [True])
+            for ((before, _), (after, _)) in zip(incumbents, incumbents[1:-1]):
+                self.assertTrue(after.better_than(before))
+            expected = lexicographic_search(tournament)
+            best = incumbents[-1][0]
+            self.assertEqual((best.max_parallel, best.max_per_day, best.preferred_count, best.schedule),
+                             (expected.max_parallel, expected.max_per_day, expected.preferred_count, expected.schedule))
+            [(first, proven)] = anytime_search(tournament, time_limit=0)
+            self.assertEqual((first.max_parallel, first.max_per_day, proven), (3, 9, False))
+
+    def test_schedule_instance(self):
+        """One template serves any bounds in any order"""
+        instance = random_instance(random.Random(2027))
+        template = ScheduleInstance(**instance)
+        for (parallel, max_per_day) in [(3, 9), (1, 1), (2, 4), (1, 9)]:
+            schedule = template.solve(parallel, max_per_day)
+            expected = Schedule.generate_schedule(parallel, max_per_day, **instance)
+            self.assertEqual((schedule.preferred_count, schedule.schedule), (expected.preferred_count, expected.schedule))
+
+    def test_candidate_arcs(self):
+        """Match -> config arcs built from bitmasks have the tier costs of plain set operations"""
+        generator = random.Random(2039)
+        for _ in range(50):
+            instance = random_instance(generator, matches=10, sessions=generator.randint(1, 4), days=generator.randint(1, 4))
+            # a preferred timeslot counts as available even when it is missing from the availability
+            for (availability, preference) in (('hosts_availability', 'hosts_preference'),
+                                               ('contestants_availability', 'contestants_preference')):
+                for person in instance[availability]:
+                    instance[availability][person] -= set(generator.sample(sorted(instance[preference][person], key=str),
+                                                                           len(instance[preference][person]) // 2))
+            template = ScheduleInstance(**instance)
+            timeslots = {slot: timeslot for (timeslot, slot) in template.slot_index.items()}
+            hosts = instance['hosts']
+            for match in instance['matches']:
+                arcs = set()
+                for edge in template.match_edges[match][1:]:
+                    config = template.node_configs[template.template.head[edge]]
+                    arcs.add((hosts[config % len(hosts)], timeslots[config // len(hosts)], template.template.cost[edge]))
+                expected = set()
+                for host in hosts:
+                    for timeslot in timeslots.values():
+                        preferred_count = 0
+                        for (person, role) in ((host, 'hosts'), (match[0], 'contestants'), (match[1], 'contestants')):
+                            if timeslot in instance[role + '_preference'][person]:
+                                preferred_count += 1
+                            elif timeslot not in instance[role + '_availability'][person]:
+                                break
+                        else:
+                            expected.add((host, timeslot, preferred_count + (3 - preferred_count) * template.miss_cost))
+                self.assertEqual(arcs, expected)
+
+            # the preferred count of a schedule is the number of people in a preferred timeslot
+            schedule = template.solve(2, 3)
+            self.assertEqual(schedule.preferred_count, sum(
+                (config.timeslot in instance['hosts_preference'][config.host]) +
+                sum(config.timeslot in instance['contestants_preference'][contestant] for contestant in match)
+                for (match, config) in schedule.schedule))
+
+    def test_off_grid_timeslots(self):
+        """Timeslots outside the days x sessions grid are ignored rather than raising"""
+        instance = random_instance(random.Random(2040))
+        plain = ScheduleInstance(**instance).solve(2, 3)
+        off_grid = {Timeslot('day9', 'session0'), Timeslot('day0', 'session9')}
+        for key in ('hosts_availability', 'hosts_preference', 'contestants_availability', 'contestants_preference'):
+            for person in instance[key]:
+                instance[key][person] |= off_grid
+        schedule = ScheduleInstance(**instance).solve(2, 3)
+        self.assertEqual((schedule.preferred_count, schedule.schedule), (plain.preferred_count, plain.schedule))
+
+    def test_resolve(self):
+        """Re-solving a solved network after availability and match edits agrees with building the edited instance"""
+        generator = random.Random(2030)
+        for _ in range(20):
+            instance = random_instance(generator, matches=10)
+            people = instance['hosts'] + instance['contestants']
+            timeslots = [Timeslot(day, session) for day in instance['days'] for session in instance['sessions']]
+            template = ScheduleInstance(**instance)
+            bounds = (generator.randint(1, 3), generator.randint(1, 9))
+            network = template.network(*bounds)
+            template.resolve(network, *bounds)
+            for _ in range(3):
+                diff = TournamentDiff()
+                for person in generator.sample(people, 2):
+                    edit = generator.choice([diff.added_availability, diff.removed_availability,
+                                             diff.added_preference, diff.removed_preference])
+                    edit[person] = set(generator.sample(timeslots, 3))
+                diff.withdrawn_matches = generator.sample(template.matches, 2)
+                pairs = [(a, b) for a in instance['contestants'] for b in instance['contestants']
+                         if a < b and (a, b) not in template.matches]
+                diff.added_matches = generator.sample(pairs, min(2, len(pairs)))
+                schedule = template.resolve(network, *bounds, diff)
+
+                instance = apply_diff(instance, diff)
+                expected = Schedule.generate_schedule(*bounds, **instance)
+                self.assertEqual(schedule.matches, instance['matches'])
+                self.assertEqual((schedule.preferred_count, len(schedule.unscheduled_matches)),
+                                 (expected.preferred_count, len(expected.unscheduled_matches)))
+                for (match, config) in schedule.schedule:
+                    for person in match:
+                        self.assertIn(config.timeslot, instance['contestants_availability'][person] | instance['contestants_preference'][person])
+                    self.assertIn(config.timeslot, instance['hosts_availability'][config.host] | instance['hosts_preference'][config.host])
+
+    def test_resolve_invalid_diff(self):
+        """A rejected diff leaves the instance and its network as they were, odd match edits are no-ops"""
+        instance = random_instance(random.Random(2037), matches=10)
+        template = ScheduleInstance(**instance)
+        network = template.network(2, 4)
+        before = template.resolve(network, 2, 4)
+        match = template.matches[0]
+        timeslot = Timeslot(instance['days'][0], instance['sessions'][0])
+        for diff in (TournamentDiff(withdrawn_matches=[match], added_matches=[('nobody', match[0])]),
+                     TournamentDiff(withdrawn_matches=[match], added_preference={'nobody': {timeslot}})):
+            with self.assertRaises(ValueError):
+                template.resolve(network, 2, 4, diff)
+            schedule = template.resolve(network, 2, 4)
+            self.assertEqual(template.matches, instance['matches'])
+            self.assertEqual((schedule.preferred_count, schedule.schedule), (before.preferred_count, before.schedule))
+
+        # withdrawing an unknown match and adding a present one change nothing, as in model.apply_diff
+        diff = TournamentDiff(withdrawn_matches=[('nobody', 'else')], added_matches=[match, match])
+        schedule = template.resolve(network, 2, 4, diff)
+        self.assertEqual(template.matches, instance['matches'])
+        self.assertEqual(schedule.preferred_count, before.preferred_count)
+        tournament = parse_tournament(generate_data(matches=6, contestants=5, hosts=2, sessions=2, days=3, seed=3))
+        pair = tournament.matches[0]
+        diff = TournamentDiff(withdrawn_matches=[('nobody', 'else')], added_matches=[pair, pair])
+        self.assertEqual(edit_tournament(tournament, diff).matches, tournament.matches)
+        self.assertEqual(edit_tournament(tournament, TournamentDiff(added_matches=[pair[::-1], pair[::-1]])).matches,
+                         tournament.matches + [pair[::-1]])
+
+    def test_pruning(self):
+        """Configs, timeslots and days nobody can use get no node until an edit makes them usable"""
+        instance = random_instance(random.Random(2031))
+        instance['hosts_availability']['host0'] = set()
+        instance['hosts_preference']['host0'] = set()
+        template = ScheduleInstance(**instance)
+        self.assertLess(template.nodes, template.unpruned_nodes)
+        self.assertFalse(any(config % 3 == 0 for config in template.config_nodes))
+        network = template.network(1, 2)
+        template.resolve(network, 1, 2)
+        timeslots = {Timeslot(day, session) for day in instance['days'] for session in instance['sessions']}
+        diff = TournamentDiff(added_preference={'host0': timeslots})
+        schedule = template.resolve(network, 1, 2, diff)
+        expected = Schedule.generate_schedule(1, 2, **apply_diff(instance, diff))
+        self.assertEqual((schedule.preferred_count, len(schedule.unscheduled_matches)),
+                         (expected.preferred_count, len(expected.unscheduled_matches)))
+
+    def test_component_search(self):
+        """Solving divisions separately and merging gives the schedule of solving them together"""
+        generator = random.Random(2032)
+        for jobs in (1, 1, 1, 2):
+            tournament = parse_tournament(generate_data(matches=18, contestants=15, hosts=2, sessions=2, days=6,
+                                                        density=generator.uniform(0.2, 0.8), seed=generator.randrange(100),
+                                                        divisions=3))
+            self.assertGreaterEqual(len(build_instance(tournament).components()), 3)
+            merged = component_search(tournament, jobs=jobs)
+            expected = lexicographic_search(tournament)
+            self.assertEqual((merged.max_parallel, merged.max_per_day, merged.preferred_count, merged.schedule, merged.unscheduled_matches),
+                             (expected.max_parallel, expected.max_per_day, expected.preferred_count, expected.schedule, expected.unscheduled_matches))
+
+    def test_backends(self):
+        """Every flow backend reaches the same counts and bounds, the check backend compares them on every solve"""
+        generator = random.Random(2034)
+        for _ in range(10):
+            tournament = Tournament(max_parallel=3, **random_instance(generator, matches=generator.randint(1, 12),
+                                                                      density=generator.uniform(0.2, 0.8)))
+            results = [lexicographic_search(tournament, backend=backend) for backend in ('ssp', 'simplex', 'check')]
+            self.assertEqual(len({(schedule.max_parallel, schedule.max_per_day, schedule.preferred_count,
+                                   len(schedule.unscheduled_matches)) for schedule in results}), 1)
+        with self.assertRaises(ValueError):
+            ScheduleInstance(**random_instance(generator), backend='unknown')
+
+    def test_stats(self):
+        tournament = Tournament(max_parallel=2, **random_instance(random.Random(2028)))
+        serial, parallel = SolverStats(), SolverStats()
+        exhaustive_search(tournament, stats=serial)
+        exhaustive_search(tournament, jobs=2, stats=parallel)
+        grid = 2 * 3 * 3
+        for stats in (serial, parallel):
+            self.assertEqual(len(stats.points), grid + 1)
+            self.assertEqual(stats.counters['solves'], grid + 1)
+            self.assertGreaterEqual(stats.counters['searches'], stats.counters['solves'])
+            self.assertIn('solve', stats.timings)
+        self.assertEqual(serial.counters['augmentations'], parallel.counters['augmentations'])
+
+
+class TestServer(unittest.TestCase):
+    def test_server(self):
+        """Requests over a unix socket are cached, answered concurrently and agree with solving directly"""
+        data = generate_data(matches=12, contestants=6, hosts=2, sessions=3, days=4, seed=8)
+        tournament = parse_tournament(data)
+        withdrawn = tournament.matches[:2]
+        diff = TournamentDiff(withdrawn_matches=withdrawn,
+                              added_preference={'host1': {Timeslot('day1', 'session1'), Timeslot('day2', 'session3')}})
+        fields = ('days', 'contestants', 'hosts', 'sessions', 'matches', 'hosts_availability', 'hosts_preference',
+                  'contestants_availability', 'contestants_preference')
+        edited = Tournament(max_parallel=tournament.max_parallel,
+                            **apply_diff({name: getattr(tournament, name) for name in fields}, diff))
+
+        async def session(path):
+            reader, writer = await asyncio.open_unix_connection(path)
+            writer.write(json.dumps({'id': 1, 'op': 'load', 'data': data}).encode() + b'\n')
+            key = json.loads(await reader.readline())['instance']
+            requests = [{'id': 2, 'op': 'solve', 'instance': key},
+                        {'id': 3, 'op': 'solve', 'instance': key},
+                        {'id': 4, 'op': 'solve', 'instance': key, 'max_parallel': 1, 'max_per_day': 2},
+                        {'id': 5, 'op': 'whatif', 'instance': key, 'diff': {
+                            'withdrawn_matches': [{'contestant1': a, 'contestant2': b} for (a, b) in withdrawn],
+                            'added_preference': {'host1': [{'day': 'day1', 'session': 'session1'},
+                                                           {'day': 'day2', 'session': 'session3'}]}}},
+                        {'id': 6, 'op': 'solve', 'instance': 'unknown'},
+                        {'id': 7, 'op': 'whatif', 'instance': key, 'diff': []},
+                        {'id': 8, 'op': 'whatif', 'instance': key, 'added_hosts': 'host9'},
+                        {'id': 9, 'op': 'solve', 'instance': key, 'backend': 'check', 'max_parallel': 'many'}]
+            for request in requests:
+                writer.write(json.dumps(request).encode() + b'\n')
+            writer.write(b'not json\n')
+            writer.write_eof()
+            responses = {}
+            while line := await reader.readline():
+                response = json.loads(line)
+                responses[response['id']] = response
+            writer.close()
+            return responses
+
+        async def run(path):
+            server = ScheduleServer(jobs=2)
+            serving = asyncio.create_task(server.serve(path))
+            try:
+                while not os.path.exists(path):
+                    await asyncio.sleep(0.01)
+                return await session(path)
+            finally:
+                serving.cancel()
+                server.close()
+
+        with tempfile.TemporaryDirectory() as directory:
+            responses = asyncio.run(run(os.path.join(directory, 'server.sock')))
+        self.assertEqual(set(responses), {2, 3, 4, 5, 6, 7, 8, 9, None})
+        for bad in (6, 7, 8, 9, None):
+            self.assertFalse(responses[bad]['ok'])
+        self.assertEqual(responses[2]['schedule'], responses[3]['schedule'])
+        self.assertTrue(responses[2]['cached'] or responses[3]['cached'])
+        self.assertEqual(responses[2]['schedule'], lexicographic_search(tournament).to_dict())
+        self.assertEqual(responses[4]['schedule'], build_instance(tournament).solve(1, 2).to_dict())
+        self.assertEqual(responses[5]['schedule'], lexicographic_search(edited).to_dict())
+
+    def test_server_responsive(self):
+        """Other requests are answered while a large tournament is hashed and parsed and a what-if of it is built"""
+        data = generate_data(matches=1200, contestants=600, hosts=20, sessions=3, days=10, seed=10)
+        diff = {'removed_availability': {'host0': [{'day': 'day1', 'session': 'session1'}]}}
+
+        async def run():
+            server = ScheduleServer(jobs=1)
+            finished = []
+
+            async def request(name, request):
+                response = await server.handle(request)
+                finished.append(name)
+                return response
+
+            try:
+                load, _ = await asyncio.gather(request('load', {'op': 'load', 'data': data}),
+                                               request('stats', {'op': 'stats'}))
+                key = load['instance']
+                self.assertTrue(load['ok'])
+                await asyncio.gather(request('whatif', {'op': 'whatif', 'instance': key, 'diff': diff,
+                                                        'max_parallel': 1, 'max_per_day': 1}),
+                                     request('stats', {'op': 'stats'}))
+            finally:
+                server.close()
+            return finished
+
+        self.assertEqual(asyncio.run(run()), ['stats', 'load', 'stats', 'whatif'])
+
+    def test_solve_worker(self):
+        """A worker asks for the tournament only when it has neither it, its template nor the base of a what-if"""
+        tournament = parse_tournament(generate_data(matches=12, contestants=6, hosts=2, sessions=3, days=4, seed=9))
+        diff = {'withdrawn_matches': [{'contestant1': tournament.matches[0][0], 'contestant2': tournament.matches[0][1]}]}
+        init_worker(4)
+        self.assertIsNone(solve_worker('base', None, 'ssp', 2, None))
+        self.assertEqual(solve_worker('base', tournament, 'ssp', 2, None), (lexicographic_search(replace(tournament, max_parallel=2)).to_dict(), False))
+        self.assertTrue(solve_worker('base', None, 'ssp', 1, 3)[1])
+        self.assertIsNotNone(solve_worker('base', None, 'simplex', 2, None))
+        schedule, hot = solve_worker('whatif', ('base', diff, []), 'ssp', 3, None)
+        self.assertEqual(schedule, lexicographic_search(edit_tournament(tournament, parse_diff(diff))).to_dict())
+        self.assertIsNone(solve_worker('other', ('unknown', diff, []), 'ssp', 3, None))
+
+
+def dying_solve_file(path, search, backend):
+    """solve_file of a worker that is killed, for memory say, while it solves crash.json"""
+    if os.path.basename(path) == 'crash.json':
+        os._exit(1)
+    return solve_file(path, search, backend)
+
+
+class TestBatch(unittest.TestCase):
+    def test_solve_batch(self):
+        """Every file gets a line with the schedule main.py would print, a broken file only fails its own line"""
+        with tempfile.TemporaryDirectory() as directory:
+            tournaments = {}
+            for seed in range(5):
+                data = generate_data(matches=10, contestants=6, hosts=2, sessions=2, days=3, seed=seed)
+                path = os.path.join(directory, 'week{}.json'.format(seed))
+                with open(path, 'w') as data_file:
+                    json.dump(data, data_file)
+                tournaments[path] = parse_tournament(data)
+            with open(os.path.join(directory, 'broken.json'), 'w') as data_file:
+                data_file.write('{"days": [')
+            for jobs in (1, 2):
+                output = io.StringIO()
+                self.assertEqual(solve_batch([directory], output, jobs=jobs, in_flight=2), 1)
+                lines = [json.loads(line) for line in output.getvalue().splitlines()]
+                self.assertEqual(sorted(line['path'] for line in lines), sorted(list(tournaments) + [os.path.join(directory, 'broken.json')]))
+                for line in lines:
+                    if line['path'] not in tournaments:
+                        self.assertFalse(line['ok'])
+                        continue
+                    expected = lexicographic_search(tournaments[line['path']]).to_dict()
+                    self.assertEqual({key: line[key] for key in expected}, expected)
+                    self.assertIn('parse', line['timings'])
+
+            # a missing file and a glob matching nothing fail their own lines, a matching glob is expanded
+            missing, unmatched = os.path.join(directory, 'missing.json'), os.path.join(directory, 'month*.json')
+            output = io.StringIO()
+            self.assertEqual(solve_batch([missing, unmatched, os.path.join(directory, 'week[01].json')], output), 2)
+            lines = [json.loads(line) for line in output.getvalue().splitlines()]
+            self.assertEqual([(line['path'], line['ok']) for line in lines],
+                             [(missing, False), (unmatched, False), (os.path.join(directory, 'week0.json'), True),
+                              (os.path.join(directory, 'week1.json'), True)])
+            self.assertIn('FileNotFoundError', lines[0]['error'])
+
+            # a dead worker fails the files in flight, the files after them run on a fresh pool
+            os.remove(os.path.join(directory, 'broken.json'))
+            with open(os.path.join(directory, 'crash.json'), 'w') as data_file:
+                data_file.write('{}')
+            for in_flight in (1, 3):
+                output = io.StringIO()
+                with unittest.mock.patch('batch.solve_file', dying_solve_file):
+                    failed = solve_batch([directory], output, jobs=2, in_flight=in_flight)
+                lines = [json.loads(line) for line in output.getvalue().splitlines()]
+                self.assertEqual(sorted(line['path'] for line in lines), sorted(list(tournaments) + [os.path.join(directory, 'crash.json')]))
+                self.assertEqual(failed, sum(not line['ok'] for line in lines))
+                for line in lines:
+                    if not line['ok']:
+                        self.assertIn('BrokenProcessPool', line['error'])
+                self.assertFalse(next(line for line in lines if line['path'].endswith('crash.json'))['ok'])
+                if in_flight == 1:
+                    # only crash.json was in flight when the worker died
+                    self.assertEqual(failed, 1)
+
+
+class TestPacked(unittest.TestCase):
+    def test_packed(self):
+        """A packed tournament loads to the same names, availability and schedule as its json"""
+        generator = random.Random(2036)
+        with tempfile.TemporaryDirectory() as directory:
+            for seed in range(5):
+                data = generate_data(matches=12, contestants=8, hosts=3, sessions=generator.randint(1, 4),
+                                     days=generator.randint(2, 5), density=generator.uniform(0.2, 0.8), seed=seed)
+                data['hosts'].append(data['contestants'][0])
+                data['hosts_availability'][data['contestants'][0]] = data['contestants_availability'][data['contestants'][0]]
+                data['hosts_preference'][data['contestants'][0]] = []
+                json_path, packed_path = os.path.join(directory, 'data.json'), os.path.join(directory, 'data.bin')
+                with open(json_path, 'w') as data_file:
+                    json.dump(data, data_file)
+                with open(packed_path, 'wb') as packed_file:
+                    packed_file.write(pack_tournament(data))
+                expected, packed = load_tournament(json_path), load_tournament(packed_path)
+                self.assertIsNone(expected.masks)
+                self.assertIsNotNone(packed.masks)
+                for field in ('max_parallel', 'days', 'sessions', 'contestants', 'hosts', 'matches'):
+                    self.assertEqual(getattr(packed, field), getattr(expected, field))
+                for field in ('hosts_availability', 'hosts_preference', 'contestants_availability', 'contestants_preference'):
+                    self.assertEqual(dict(getattr(packed, field)), getattr(expected, field))
+                self.assertEqual(lexicographic_search(packed).to_dict(), lexicographic_search(expected).to_dict())
+                # edits work on the timeslot sets, the edited tournament no longer has masks
+                diff = TournamentDiff(withdrawn_matches=expected.matches[:3],
+                                      added_availability={expected.hosts[0]: {Timeslot(expected.days[0], expected.sessions[0])}})
+                edited = edit_tournament(packed, diff)
+                self.assertIsNone(edited.masks)
+                self.assertEqual(lexicographic_search(edited).to_dict(),
+                                 lexicographic_search(edit_tournament(expected, diff)).to_dict())
+            # damaged files fail with a ValueError naming the problem, an empty .bin included
+            packed = pack_tournament(data)
+            for (content, message) in ((packed[:-1], 'truncated'), (packed[:20], 'truncated'), (b'', 'truncated'),
+                                       (b'JSON' + packed[4:], 'version')):
+                with open(packed_path, 'wb') as packed_file:
+                    packed_file.write(content)
+                with self.assertRaisesRegex(ValueError, message):
+                    load_tournament(packed_path)
+
+
+class TestGenerate(unittest.TestCase):
+    def test_generate_data(self):
+        data = generate_data(matches=12, contestants=6, hosts=2, sessions=3, days=4, seed=7)
+        self.assertEqual(data, generate_data(matches=12, contestants=6, hosts=2, sessions=3, days=4, seed=7))
+        tournament = parse_tournament(data)
+        self.assertEqual(len(set(tournament.matches)), 12)
+        for contestant in tournament.contestants:
+            self.assertTrue(tournament.contestants_preference[contestant] <= tournament.contestants_availability[contestant])
+        self.assertIsNotNone(lexicographic_search(tournament))